@@ -0,0 +1,310 @@
+"""
+Load benchmark for the shop's hot endpoints.
+
+Seeds a synthetic catalog (benchmarks.synthetic) into a separate MongoDB
+database, drives the views through Django's test client and reports latency
+percentiles, throughput and MongoDB/SQL queries per request.
+
+No baseline is committed: timings only mean something on the machine that
+recorded them. Record one there with --save-baseline (it stores the scale,
+concurrency and mode next to the results) and later runs with the same
+--baseline fail when they regress against it; without one a run only reports.
+
+    cd backend && python -m benchmarks.load_benchmark --scale 10 --requests 300 --concurrency 4
+    cd backend && python -m benchmarks.load_benchmark --save-baseline
+    cd backend && python -m benchmarks.load_benchmark --in-memory   # needs requirements-dev.txt (mongomock)
+
+The catalog goes to MONGO_DB_NAME=honey_benchmark unless --database says
+otherwise, so a development database is never overwritten. --in-memory uses
+mongomock instead of a mongod: it has no $text support, so the search
+scenario is skipped, it lacks $topN, so there is no recommendation table
+(nor refresh after an order), it emits no command events, so mongo/req is not reported (nor
+compared), and its timings only make sense relative to each other.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines.json'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='catalog size multiplier (see benchmarks.synthetic)')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    parser.add_argument('--only', nargs='*', help='run only these scenarios')
+    parser.add_argument('--database', default='honey_benchmark')
+    parser.add_argument('--in-memory', action='store_true', help='use mongomock instead of a mongod')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the catalog of a previous run')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p95 slowdown / throughput drop before failing')
+    return parser.parse_args(argv)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # builds (path, data) for one request; runs outside the timed section
+    build: Callable
+    login: bool = False
+    needs_text_index: bool = False
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def build_scenarios(catalog):
+    from honey_api.mongo_models import carts
+    from honey_api.views import SHOP_PAGE_SIZE
+
+    pages = max(1, catalog['products'] // SHOP_PAGE_SIZE)
+
+    def shop(ctx):
+        sort = ctx.rng.choice(['title', '-title', 'price', '-price'])
+        return f'/shop/?sort={sort}&page={ctx.rng.randint(1, min(pages, 50))}', None
+
+    def shop_search(ctx):
+        return f'/shop/?q={ctx.rng.choice(catalog["words"])}', None
+
+    def product_detail(ctx):
+        return f'/product/{ctx.rng.choice(catalog["slugs"])}/', None
+
+    def add_to_cart(ctx):
+        return '/cart/add/', {'product_slug': ctx.rng.choice(catalog['slugs']), 'quantity': 1}
+
+    def create_order(ctx):
+        carts.add_item(ctx.user.id, ctx.rng.choice(catalog['slugs']), 1, 10.0)
+        return '/order/create/', {'saved_address': ctx.address_id, 'idempotency_key': uuid.uuid4().hex}
+
+    return [
+        Scenario('index', 'get', lambda ctx: ('/', None)),
+        Scenario('shop', 'get', shop),
+        Scenario('shop_search', 'get', shop_search, needs_text_index=True),
+        Scenario('product_detail', 'get', product_detail),
+        Scenario('cart_view', 'get', lambda ctx: ('/cart/', None), login=True),
+        Scenario('add_to_cart', 'post', add_to_cart, login=True),
+        Scenario('checkout', 'get', lambda ctx: ('/checkout/', None), login=True),
+        Scenario('create_order', 'post', create_order, login=True),
+    ]
+
+
+class Worker:
+    """One client thread: a logged-in and an anonymous test client for one user."""
+
+    def __init__(self, user, address_id, seed):
+        from django.test import Client
+
+        self.user = user
+        self.address_id = address_id
+        self.rng = random.Random(seed)
+        self.anonymous = Client()
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, scenario):
+        from honey_api.profiling import profile_queries
+
+        path, data = scenario.build(self)
+        client = self.client if scenario.login else self.anonymous
+        send = getattr(client, scenario.method)
+        with profile_queries() as profile:
+            start = time.perf_counter()
+            response = send(path, data) if data is not None else send(path)
+            elapsed = time.perf_counter() - start
+        return elapsed, profile.mongo_count, profile.sql_count, response.status_code < 400
+
+
+def run_scenario(scenario, workers, requests, warmup):
+    lock = threading.Lock()
+    samples = []
+
+    def drive(worker, count, record):
+        for _ in range(count):
+            result = worker.request(scenario)
+            if record:
+                with lock:
+                    samples.append(result)
+
+    def spread(total):
+        share, extra = divmod(total, len(workers))
+        return [share + (1 if i < extra else 0) for i in range(len(workers))]
+
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        list(pool.map(lambda args: drive(*args, False), zip(workers, spread(warmup))))
+        start = time.perf_counter()
+        list(pool.map(lambda args: drive(*args, True), zip(workers, spread(requests))))
+        wall = time.perf_counter() - start
+
+    latencies = [sample[0] * 1000 for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not sample[3]),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else 0.0,
+        'mongo_per_request': round(sum(sample[1] for sample in samples) / len(samples), 2),
+        'sql_per_request': round(sum(sample[2] for sample in samples) / len(samples), 2),
+    }
+
+
+def compare(results, baseline, settings, tolerance):
+    """Return the list of regressions against a stored baseline."""
+    regressions = []
+    same_setup = baseline.get('settings') == settings
+    if not same_setup:
+        print('\nbaseline was recorded with different settings; comparing query counts only')
+
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        for key in ('mongo_per_request', 'sql_per_request'):
+            if result[key] is None or base.get(key) is None:
+                continue
+            # query counts are deterministic, any real increase is a regression
+            if result[key] > base[key] + 0.5:
+                regressions.append(f'{name}: {key} {base[key]} -> {result[key]}')
+        if not same_setup:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {base["p95_ms"]}ms -> {result["p95_ms"]}ms')
+        if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f'{name}: throughput {base["throughput_rps"]} -> {result["throughput_rps"]} req/s')
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    os.environ['MONGO_DB_NAME'] = args.database
+    if args.in_memory:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('--in-memory needs mongomock: pip install -r requirements-dev.txt')
+        import pymongo
+        import mongomock.collection
+        pymongo.MongoClient = mongomock.MongoClient
+
+        # pymongo >= 4.9 passes sort= to bulk updates and replaces, which mongomock does not know about
+        builder = mongomock.collection.BulkOperationBuilder
+        add_update, add_replace = builder.add_update, builder.add_replace
+        builder.add_update = lambda self, *a, sort=None, **kw: add_update(self, *a, **kw)
+        builder.add_replace = lambda self, *a, sort=None, **kw: add_replace(self, *a, **kw)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'honey_site.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases
+
+    from benchmarks import synthetic
+    from core.models import Address
+    from honey_api.mongo_models import orders, recommendations
+    from mongodb_connector import mongodb
+
+    if args.in_memory:
+        # mongomock has neither the hello command nor transactions, nor the $topN / $firstN
+        # the recommendation table is built with: create_order is measured without the
+        # refresh and product pages use their same-category fallback
+        orders._transactions = False
+        recommendations.record_order = lambda items: None
+        recommendations.rebuild = lambda: None
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    # the benchmark measures queries itself; keep the budget middleware out of the numbers
+    budget_off = override_settings(QUERY_BUDGET_ENABLED=False)
+    budget_off.enable()
+    try:
+        users, address_ids = [], []
+        for i in range(args.users):
+            user = get_user_model().objects.create_user(username=f'bench{i}', password='bench-password')
+            address = Address.objects.create(user=user, name='Home', address='1 Hive Street',
+                                             city='Bee Town', state='Nectar', postal_code='12345')
+            users.append(user)
+            address_ids.append(address.id)
+
+        if not args.no_seed:
+            print(f'seeding {args.database} at scale {args.scale}')
+            start = time.perf_counter()
+            synthetic.seed(args.scale, users=[user.id for user in users])
+            print(f'  seeded in {time.perf_counter() - start:.1f}s')
+
+        products = mongodb.database['products']
+        catalog = {
+            'products': products.estimated_document_count(),
+            'slugs': [doc['slug'] for doc in products.find({}, {'slug': 1, '_id': 0}).limit(5000)],
+            'words': [word.lower() for word in synthetic.FLAVOURS],
+        }
+        if not catalog['slugs']:
+            sys.exit(f'no products in {args.database}; run without --no-seed')
+
+        workers = [Worker(users[i % len(users)], address_ids[i % len(users)], seed=i)
+                   for i in range(args.concurrency)]
+
+        results = {}
+        header = (f'{"scenario":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}'
+                  f'{"mongo/req":>11}{"sql/req":>9}{"errors":>8}')
+        print('\n' + header + '\n' + '-' * len(header))
+        for scenario in build_scenarios(catalog):
+            if args.only and scenario.name not in args.only:
+                continue
+            if scenario.needs_text_index and args.in_memory:
+                print(f'{scenario.name:<16}skipped (no $text in mongomock)')
+                continue
+            result = results[scenario.name] = run_scenario(scenario, workers, args.requests, args.warmup)
+            if args.in_memory:
+                # mongomock publishes no command events, the count would always be 0
+                result['mongo_per_request'] = None
+            mongo = '-' if result['mongo_per_request'] is None else f'{result["mongo_per_request"]:.2f}'
+            print(f'{scenario.name:<16}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                  f'{result["throughput_rps"]:>9.1f}{mongo:>11}'
+                  f'{result["sql_per_request"]:>9.2f}{result["errors"]:>8}')
+    finally:
+        budget_off.disable()
+        teardown_databases(old_config, verbosity=0)
+
+    settings = {'scale': args.scale, 'concurrency': args.concurrency, 'in_memory': args.in_memory}
+    failures = [f'{name}: {result["errors"]} failed requests' for name, result in results.items() if result['errors']]
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({'settings': settings, 'results': results}, indent=2) + '\n')
+        print(f'\nbaseline written to {args.baseline}')
+    elif args.baseline.exists():
+        failures += compare(results, json.loads(args.baseline.read_text()), settings, args.tolerance)
+    else:
+        print(f'\nno baseline at {args.baseline}; run with --save-baseline to record one')
+
+    if failures:
+        print('\nREGRESSIONS')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
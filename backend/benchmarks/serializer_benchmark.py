@@ -0,0 +1,73 @@
+"""
+Microbenchmark: mongo_serializer vs the compiled product card serializer.
+
+    cd backend && python -m benchmarks.serializer_benchmark --docs 20000
+"""
+import argparse
+import os
+import timeit
+from datetime import datetime
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "honey_site.settings")
+django.setup()
+
+from bson import ObjectId
+
+from honey_api.serializer import mongo_serializer, product_card_serializer
+
+
+def make_products(count):
+    category_id = ObjectId()
+    return [
+        {
+            '_id': ObjectId(),
+            'title': f"Product {i}",
+            'title_lower': f"product {i}",
+            'slug': f"product-{i}",
+            'category_id': category_id,
+            'price': 9.99 + i,
+            'description': "Pure wildflower honey harvested from local farms " * 4,
+            'images': [],
+            'status': 'active',
+            'modified_at': datetime.now(),
+            'review_count': 3,
+            'rating_sum': 13,
+            'rating_histogram': {'4': 2, '5': 1},
+        }
+        for i in range(count)
+    ]
+
+
+def project(docs, projection):
+    return [{key: value for key, value in doc.items() if key == '_id' or key in projection} for doc in docs]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    full_docs = make_products(args.docs)
+    # what the server returns once the view pushes the projection down
+    projected_docs = project(full_docs, product_card_serializer.projection)
+
+    cases = [
+        ("mongo_serializer, full documents", lambda: mongo_serializer(full_docs)),
+        ("mongo_serializer, projected documents", lambda: mongo_serializer(projected_docs)),
+        ("compiled serializer, projected documents", lambda: product_card_serializer.many(projected_docs)),
+        ("compiled serializer, streaming", lambda: sum(1 for _ in product_card_serializer.stream(projected_docs))),
+    ]
+
+    baseline = None
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        per_doc = best / args.docs * 1e6
+        print(f"{name:<45} {best * 1000:8.2f} ms  {per_doc:6.2f} us/doc  x{baseline / best:4.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Synthetic catalog for benchmarks: N categories, products, reviews, carts and
+orders with the same document shapes the managers in honey_api.mongo_models
+write, bulk inserted so large scales load quickly.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.utils.text import slugify
+
+from honey_api.cache import invalidate_tags
+from honey_api.mongo_models import managers, recommendations, reviews
+from honey_api.search import normalize_title
+from honey_api.utils import generate_order_number
+from mongodb_connector import mongodb
+
+FLAVOURS = ["Wildflower", "Clover", "Manuka", "Acacia", "Lavender", "Orange Blossom", "Buckwheat",
+            "Thyme", "Chestnut", "Eucalyptus", "Linden", "Sage", "Heather", "Forest", "Sunflower"]
+STYLES = ["Raw", "Organic", "Creamed", "Infused", "Comb", "Unfiltered", "Whipped", "Spiced"]
+SIZES = ["250g", "500g", "1kg", "Gift Jar", "Squeeze Bottle"]
+WORDS = ("smooth floral sweet rich golden mild bold fresh local aromatic dark light thick "
+         "delicate warm earthy fruity crisp velvety bright").split()
+
+# scale 1 is a small shop; every collection grows linearly with it
+SCALE = {
+    'categories': 8,
+    'products': 250,
+    'reviews': 1000,
+    'carts': 50,
+    'orders': 200,
+}
+
+COLLECTIONS = ('categories', 'products', 'reviews', 'carts', 'orders', 'user_stats',
+               'product_pairs', 'recommendations', 'slug_counters')
+
+
+def sizes(scale):
+    return {name: max(1, int(count * scale)) for name, count in SCALE.items()}
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _chunks(docs, size):
+    chunk = []
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_categories(count, rng):
+    roots = max(1, count // 4)
+    categories = []
+    for i in range(count):
+        name = f"{rng.choice(STYLES)} {rng.choice(FLAVOURS)} Honey {i}"
+        parent = categories[rng.randrange(roots)]['_id'] if i >= roots else None
+        categories.append({
+            '_id': ObjectId(),
+            'name': name,
+            'slug': slugify(name),
+            'description': _sentence(rng),
+            'parent_id': parent,
+        })
+    return categories
+
+
+def generate_products(count, categories, rng):
+    now = datetime.now()
+    for i in range(count):
+        title = f"{rng.choice(FLAVOURS)} {rng.choice(STYLES)} Honey {rng.choice(SIZES)} {i}"
+        yield {
+            'title': title,
+            'title_lower': normalize_title(title),
+            'slug': slugify(title),
+            'category_id': rng.choice(categories)['_id'],
+            'price': round(rng.uniform(5, 60), 2),
+            'description': _sentence(rng, 30),
+            'images': [],
+            'status': 'active',
+            'modified_at': now - timedelta(minutes=i),
+        }
+
+
+def generate_reviews(count, slugs, users, rng):
+    now = datetime.now()
+    seen = set()
+    for _ in range(count):
+        user_id, slug = rng.choice(users), rng.choice(slugs)
+        # one review per user and product, like add_review enforces
+        if (user_id, slug) in seen:
+            continue
+        seen.add((user_id, slug))
+        yield {
+            'user_id': user_id,
+            'product_slug': slug,
+            'rating': rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0],
+            'comment': _sentence(rng),
+            'date': now - timedelta(hours=rng.randrange(24 * 365)),
+        }
+
+
+def _items(products, rng):
+    items = []
+    for product in rng.sample(products, k=min(len(products), rng.randint(1, 5))):
+        items.append({'product_slug': product['slug'], 'quantity': rng.randint(1, 3), 'price': product['price']})
+    return items
+
+
+def generate_carts(count, products, users, rng):
+    for user_id in users[:count]:
+        items = _items(products, rng)
+        yield {
+            'user_id': user_id,
+            'items': items,
+            'total_amount': round(sum(item['quantity'] * item['price'] for item in items), 2),
+        }
+
+
+def generate_orders(count, products, users, rng):
+    now = datetime.now()
+    for _ in range(count):
+        items = _items(products, rng)
+        yield {
+            'user_id': rng.choice(users),
+            'items': items,
+            'total_amount': round(sum(item['quantity'] * item['price'] for item in items), 2),
+            'payment_status': 'pending',
+            'order_status': rng.choice(['processing', 'shipped', 'delivered']),
+            'address_id': None,
+            'order_number': generate_order_number(),
+            'idempotency_key': uuid.uuid4().hex,
+            'date': now - timedelta(hours=rng.randrange(24 * 365)),
+        }
+
+
+def seed(scale=1.0, users=(1,), seed=0, chunk_size=1000, log=print):
+    """
+    Replace the catalog with a synthetic one and rebuild everything derived
+    from it (indexes, review aggregates, recommendations, cache versions).
+    Returns the number of documents inserted per collection.
+    """
+    rng = random.Random(seed)
+    counts = sizes(scale)
+    users = list(users)
+    database = mongodb.database
+
+    for name in COLLECTIONS:
+        database[name].delete_many({})
+    for manager in managers:
+        manager.ensure_indexes()
+
+    inserted = {}
+
+    def insert(name, docs):
+        inserted[name] = 0
+        for chunk in _chunks(docs, chunk_size):
+            database[name].insert_many(chunk, ordered=False)
+            inserted[name] += len(chunk)
+        log(f"  {name:<12} {inserted[name]:>9}")
+
+    categories = generate_categories(counts['categories'], rng)
+    insert('categories', categories)
+
+    products = list(generate_products(counts['products'], categories, rng))
+    insert('products', products)
+    light_products = [{'slug': p['slug'], 'price': p['price']} for p in products]
+    del products
+
+    slugs = [p['slug'] for p in light_products]
+    insert('reviews', generate_reviews(counts['reviews'], slugs, users, rng))
+    insert('carts', generate_carts(counts['carts'], light_products, users, rng))
+    insert('orders', generate_orders(counts['orders'], light_products, users, rng))
+
+    reviews.rebuild_aggregates()
+    recommendations.rebuild()
+    invalidate_tags('products', 'categories')
+    return inserted
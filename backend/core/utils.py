@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.models import User
+
+# user_id -> (username, expires_at), kept in LRU order
+_username_cache = OrderedDict()
+_username_cache_lock = threading.Lock()
+
+
+def get_usernames(user_ids):
+    user_ids = set(user_ids)
+    usernames = {}
+    now = time.monotonic()
+
+    with _username_cache_lock:
+        for user_id in user_ids:
+            entry = _username_cache.get(user_id)
+            if entry and entry[1] > now:
+                _username_cache.move_to_end(user_id)
+                usernames[user_id] = entry[0]
+
+    missing = user_ids - usernames.keys()
+    if not missing:
+        return usernames
+
+    fetched = dict(User.objects.filter(id__in=missing).values_list('id', 'username'))
+    usernames.update(fetched)
+
+    max_size = settings.USERNAME_CACHE_SIZE
+    if max_size:
+        expires_at = now + settings.USERNAME_CACHE_TTL
+        with _username_cache_lock:
+            for user_id, username in fetched.items():
+                _username_cache[user_id] = (username, expires_at)
+                _username_cache.move_to_end(user_id)
+            while len(_username_cache) > max_size:
+                _username_cache.popitem(last=False)
+
+    return usernames
+
+
+def invalidate_username(user_id):
+    with _username_cache_lock:
+        _username_cache.pop(user_id, None)
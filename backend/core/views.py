@@ -10,9 +10,13 @@ from django.contrib import messages
 from django.shortcuts import render, redirect
 
 from core.serializers import AddressSerializer
+from core.utils import invalidate_username
 from django.views.decorators.http import require_POST
 
-from honey_api.views import get_orders
+from honey_api.concurrency import fan_out
+from honey_api.views import user_orders_page
+from honey_api.mongo_models import orders, reviews
+from honey_api.serializer import order_serializer
 from mongodb_connector import mongodb
 
 @csrf_exempt
@@ -94,16 +98,26 @@ def logout_user(request):
 @login_required
 def profile(request):
     try:
-        addresses = Address.objects.filter(user=request.user)
-        addresses_list = AddressSerializer(addresses, many=True).data
-        reviews = list(mongodb.database['reviews'].find({"user_id": request.user.id}))
-        total_spend, orders = get_orders(request)
+        def load_stats():
+            user_stats = mongodb.database['user_stats'].find_one({"_id": request.user.id}) or {}
+            return (reviews.user_review_count(request.user.id, user_stats),
+                    orders.stats(request.user.id, user_stats))
+
+        with fan_out() as fetch:
+            stats = fetch.submit(load_stats)
+            orders_page = fetch.submit(user_orders_page, request.user.id, request.GET.get('orders_after'))
+            addresses = Address.objects.filter(user=request.user)
+            addresses_list = AddressSerializer(addresses, many=True).data
+            reviews_count, (order_count, total_spend) = stats.result()
+            user_orders, next_orders = orders_page.result()
 
         context = {
             'addresses': addresses_list,
-            'orders': orders,
+            'orders': order_serializer(user_orders),
+            'next_orders': next_orders,
+            'order_count': order_count,
             'total_spend': total_spend,
-            'reviews_count': len(reviews)
+            'reviews_count': reviews_count
         }
 
         return render(request, 'profile.html', context)
@@ -124,6 +138,7 @@ def update_profile(request):
         request.user.phone = data.get('phone', request.user.phone)
         
         request.user.save()
+        invalidate_username(request.user.id)
         
         messages.success(request, "Your profile has been updated successfully!")
         return redirect('profile')
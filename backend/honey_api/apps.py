@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HoneyApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'honey_api'
+
+    def ready(self):
+        from honey_api import checks  # noqa: F401
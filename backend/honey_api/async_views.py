@@ -0,0 +1,148 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+
+from honey_api.cache import acached
+from honey_api.categories import category_store
+from honey_api.http_cache import catalog_page
+from honey_api.mongo_models import carts, recommendations
+from honey_api.pagination import akeyset_page
+from honey_api.search import asuggest_products
+from honey_api.serializer import (
+    cart_serializer, review_serializer, product_serializer, product_card_serializer, product_list_serializer,
+)
+from honey_api.utils import aget_products_by_slug
+from honey_api.views import REVIEWS_PAGE_SIZE
+from mongodb_connector import mongodb
+
+# Async counterparts of the catalog and cart views in honey_api.views, served
+# when settings.ASYNC_VIEWS is on (under ASGI, see honey_site/asgi.py). Mongo
+# goes through the async client and independent reads run concurrently.
+# Anything still synchronous (templates with request.user, the ORM behind
+# usernames, the in-process category store) is wrapped in sync_to_async.
+
+arender = sync_to_async(render)
+# category_store only touches MongoDB when its snapshot is stale, no need for the request thread
+category_list = sync_to_async(category_store.serialized, thread_sensitive=False)
+
+
+async def product_reviews_page(slug, after=None):
+    return await akeyset_page(mongodb.async_catalog_database['reviews'], {"product_slug": slug}, 'date',
+                              direction=-1, after=after, limit=REVIEWS_PAGE_SIZE)
+
+
+@require_http_methods(["GET"])
+@catalog_page('products', 'categories')
+async def index(request):
+    try:
+        async def load_featured():
+            products = await mongodb.async_catalog_database['products'].find(
+                {}, product_card_serializer.projection).limit(3).to_list()
+            return product_card_serializer.many(products)
+
+        featured_products, categories = await asyncio.gather(
+            acached('featured_products', (), load_featured, tags=('products',)),
+            category_list(),
+        )
+
+        context = {
+            'featured_products': featured_products,
+            'categories': categories
+        }
+        return await arender(request, 'index.html', context)
+
+    except Exception as e:
+        return await arender(request, '404.html', {'detail': str(e)}, status=404)
+
+
+@require_http_methods(["GET"])
+@catalog_page('products')
+async def product_list(request):
+    try:
+        async def load():
+            products = await mongodb.async_catalog_database['products'].find(
+                {}, product_list_serializer.projection).to_list()
+            return product_list_serializer.many(products)
+
+        context = {
+            'products': await acached('product_list', (), load, tags=('products',)),
+        }
+        return await arender(request, 'products.html', context)
+
+    except Exception as e:
+        return await arender(request, '404.html', {'detail': str(e)}, status=404)
+
+
+@require_http_methods(["GET"])
+@catalog_page('products', 'categories', 'reviews')
+async def product_detail(request, slug):
+    try:
+        async def load():
+            product = await mongodb.async_catalog_database['products'].find_one({"slug": slug})
+            if not product:
+                return None
+
+            (reviews, reviews_next), related_products = await asyncio.gather(
+                product_reviews_page(slug),
+                recommendations.arelated(product),
+            )
+            serialized_product, serialized_reviews = await asyncio.gather(
+                sync_to_async(product_serializer, thread_sensitive=False)(product),
+                sync_to_async(review_serializer)(reviews),
+            )
+
+            return {
+                'product': serialized_product,
+                'reviews': serialized_reviews,
+                'reviews_next': reviews_next,
+                'related_products': related_products
+            }
+
+        context = await acached('product_detail', (slug,), load, tags=('products', 'categories', 'reviews'))
+        if context is None:
+            return await arender(request, '404.html', {'detail': "Product not found."}, status=404)
+
+        return await arender(request, 'product_detail.html', context)
+
+    except Exception as e:
+        return await arender(request, '404.html', {'detail': str(e)}, status=404)
+
+
+@require_http_methods(["GET"])
+async def product_reviews(request, slug):
+    try:
+        reviews, next_cursor = await product_reviews_page(slug, request.GET.get('after'))
+        results = await sync_to_async(review_serializer)(reviews)
+        return JsonResponse({'results': results, 'next': next_cursor})
+    except Exception as e:
+        return JsonResponse({'detail': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+async def search_suggestions(request):
+    suggestions = await asuggest_products(request.GET.get('q', ''))
+    return JsonResponse({'results': suggestions})
+
+
+@login_required(login_url='login')
+@require_http_methods(["GET"])
+async def cart_view(request):
+    try:
+        # request.user would hit the session store synchronously
+        user = await request.auser()
+        user_cart = await carts.aget_or_create(user.id)
+        products = await aget_products_by_slug(item['product_slug'] for item in user_cart['items'])
+
+        context = {
+            'cart': cart_serializer(user_cart, products)
+        }
+
+        return await arender(request, 'cart.html', context)
+    except Exception as e:
+        messages.error(request, str(e))
+        return await arender(request, '404.html', {'detail': str(e)}, status=500)
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from bson import json_util
+from django.conf import settings
+from django.core.cache import caches
+
+from honey_api import versions
+
+# Catalog data cache on top of Django's cache framework. The backend is picked in
+# settings.CACHES (per-worker LocMemCache by default, Redis when REDIS_URL is set).
+#
+# Keys are namespaced and embed the current version of every tag they depend on.
+# Tags are the catalog version counters in honey_api.versions, so invalidating a
+# tag is a counter bump and old entries simply stop being read and expire.
+
+_MISSING = object()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def make_key(namespace, *parts):
+    digest = hashlib.md5(json_util.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return f"catalog:{namespace}:{digest}"
+
+
+def _lead_or_follow(key):
+    # the first caller for a key gets None and computes it; later ones get the Event to wait on
+    with _inflight_lock:
+        event = _inflight.get(key)
+        if event is None:
+            _inflight[key] = threading.Event()
+        return event
+
+
+def _done(key):
+    with _inflight_lock:
+        _inflight.pop(key).set()
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        versions.bump(tag)
+
+
+def cached(namespace, key_parts, compute, tags=(), timeout=None):
+    """
+    Return the cached value for (namespace, key_parts) or compute and store it.
+    Concurrent misses on the same key are collapsed so only one caller runs
+    compute(): threads of a worker wait on the leader's Event, workers share a
+    cache.add() lock.
+    """
+    cache = get_cache()
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    tag_versions = [versions.current(tag) for tag in tags]
+    key = make_key(namespace, *key_parts, *tag_versions)
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+    # no lock is held while compute() runs, so it may call cached() itself
+    while (event := _lead_or_follow(key)) is not None:
+        event.wait(lock_timeout)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+    try:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f"{key}:lock"
+        acquired = cache.add(lock_key, 1, lock_timeout)
+        if not acquired:
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = cache.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            if acquired:
+                cache.delete(lock_key)
+    finally:
+        _done(key)
+
+    return value
+
+
+async def acached(namespace, key_parts, compute, tags=(), timeout=None):
+    """cached() for async views: compute is a coroutine function, the entries are shared."""
+    cache = get_cache()
+    timeout = settings.CATALOG_CACHE_TIMEOUT if timeout is None else timeout
+    tag_versions = [await versions.acurrent(tag) for tag in tags]
+    key = make_key(namespace, *key_parts, *tag_versions)
+
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+    acquired = await cache.aadd(lock_key, 1, lock_timeout)
+    if not acquired:
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = await cache.aget(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+    try:
+        value = await compute()
+        await cache.aset(key, value, timeout)
+    finally:
+        if acquired:
+            await cache.adelete(lock_key)
+    return value
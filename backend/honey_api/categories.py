@@ -0,0 +1,82 @@
+import threading
+
+from honey_api import versions
+from honey_api.serializer import category_serializer
+from honey_api.utils import get_object_id
+from mongodb_connector import mongodb
+
+
+class CategoryStore:
+    """
+    Per-worker copy of the categories collection with lookups by id and slug
+    and the parent -> children tree. Reloaded when the 'categories' version
+    counter changes (bumped by CategoryManager.create_category).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._categories = []
+        self._serialized = []
+        self._by_id = {}
+        self._by_slug = {}
+        self._children = {}
+
+    def _ensure_loaded(self):
+        version = versions.current('categories')
+        if version == self._version:
+            return
+
+        with self._lock:
+            if version == self._version:
+                return
+
+            # read from the primary like the version counter, a lagging secondary could
+            # otherwise pin the old tree under the new version until the next bump
+            categories = list(mongodb.database['categories'].find(sort=[('name', 1)]))
+            children = {}
+            for category in categories:
+                children.setdefault(category.get('parent_id'), []).append(category)
+
+            self._categories = categories
+            self._serialized = category_serializer.many(categories)
+            self._by_id = {category['_id']: category for category in categories}
+            self._by_slug = {category['slug']: category for category in categories}
+            self._children = children
+            self._version = version
+
+    def all(self):
+        self._ensure_loaded()
+        return self._categories
+
+    def serialized(self):
+        self._ensure_loaded()
+        return self._serialized
+
+    def get(self, category_id):
+        self._ensure_loaded()
+        return self._by_id.get(get_object_id(category_id))
+
+    def get_by_slug(self, slug):
+        self._ensure_loaded()
+        return self._by_slug.get(slug)
+
+    def children(self, category_id=None):
+        self._ensure_loaded()
+        return self._children.get(get_object_id(category_id) if category_id else None, [])
+
+    def descendant_ids(self, category_id):
+        category_id = get_object_id(category_id)
+        ids = [category_id]
+        for child in self.children(category_id):
+            ids.extend(self.descendant_ids(child['_id']))
+        return ids
+
+    def tree(self, parent_id=None):
+        return [
+            dict(category_serializer(category), children=self.tree(category['_id']))
+            for category in self.children(parent_id)
+        ]
+
+
+category_store = CategoryStore()
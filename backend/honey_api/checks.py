@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from pymongo.errors import PyMongoError
+
+
+# deploy only: it talks to MongoDB, which test, shell, makemigrations... must not wait for
+@register(deploy=True)
+def mongo_indexes_check(app_configs, **kwargs):
+    if not getattr(settings, 'MONGO_INDEX_CHECK', True):
+        return []
+
+    from honey_api.mongo_models import managers
+
+    warnings = []
+    for manager in managers:
+        try:
+            missing, changed, _ = manager.index_status()
+        except PyMongoError as e:
+            return [Warning(f"Could not verify MongoDB indexes: {e}", id='honey_api.W002')]
+
+        for name in missing + changed:
+            warnings.append(Warning(
+                f"MongoDB index '{name}' on '{manager.collection_name}' is missing or out of date.",
+                hint="Run `python manage.py mongo_indexes`.",
+                id='honey_api.W001',
+            ))
+    return warnings
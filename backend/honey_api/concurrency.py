@@ -0,0 +1,129 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Request-scoped fan-out of independent fetches onto a small shared thread pool,
+# so a view waits for its slowest query instead of the sum of all of them:
+#
+#     with fan_out() as fetch:
+#         cart = fetch.submit(carts.get_or_create, user_id)
+#         addresses = list(Address.objects.filter(user=user))   # meanwhile, on the request thread
+#         context = {'cart': cart_serializer(cart.result()), ...}
+#
+# Keep ORM queries on the request thread (its connection, transaction and
+# query profile); submit MongoDB reads, the driver is thread safe.
+
+_REQUIRED = object()
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool, _pool_pid, _slots
+    # like the MongoDB client, a pool inherited from the gunicorn master has no threads
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=settings.FAN_OUT_WORKERS, thread_name_prefix='fan-out')
+                _slots = threading.BoundedSemaphore(settings.FAN_OUT_WORKERS)
+                _pool_pid = os.getpid()
+    return _pool, _slots
+
+
+def _run_in_worker(context, fn, args, kwargs):
+    try:
+        # the request's ContextVars (query profile, metrics view label) follow the call
+        return context.run(fn, *args, **kwargs)
+    finally:
+        # a stray ORM call would otherwise leave a connection open in a pool thread
+        connections.close_all()
+
+
+class Fetch:
+    def __init__(self, group, fn, args, kwargs):
+        self.group = group
+        self.name = getattr(fn, '__qualname__', repr(fn))
+        self._call = (fn, args, kwargs)
+        self._future = None
+        self._done = False
+        self._value = None
+        self._error = None
+
+    def _resolve(self):
+        if self._done:
+            return
+        if self._future is None:
+            # the pool was saturated when this was submitted: run it here instead of queueing
+            fn, args, kwargs = self._call
+            try:
+                self._value = fn(*args, **kwargs)
+            except Exception as e:
+                self._error = e
+        elif not wait([self._future], timeout=self.group.remaining()).done:
+            self._future.cancel()
+            self._error = TimeoutError(f'{self.name} did not finish within {self.group.timeout}s')
+        else:
+            # a TimeoutError raised by the call itself (socket timeouts) is just its error
+            try:
+                self._value = self._future.result()
+            except Exception as e:
+                self._error = e
+        self._done = True
+
+    def result(self, default=_REQUIRED):
+        """The call's return value; re-raises its error (or timeout) unless a default is given."""
+        self._resolve()
+        if self._error is None:
+            return self._value
+        if default is _REQUIRED:
+            raise self._error
+        logger.warning('fan-out call %s failed, using default: %s', self.name, self._error)
+        return default
+
+
+class fan_out:
+    """Run independent calls of one request concurrently; see the module comment."""
+
+    def __init__(self, timeout=None):
+        self.timeout = settings.FAN_OUT_TIMEOUT if timeout is None else timeout
+        self.deadline = time.monotonic() + self.timeout
+        self.fetches = []
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def submit(self, fn, *args, **kwargs):
+        fetch = Fetch(self, fn, args, kwargs)
+        pool, slots = _executor()
+        if slots.acquire(blocking=False):
+            try:
+                fetch._future = pool.submit(_run_in_worker, contextvars.copy_context(), fn, args, kwargs)
+            except RuntimeError:
+                # interpreter shutting down
+                slots.release()
+            else:
+                # also runs for calls cancelled before they started
+                fetch._future.add_done_callback(lambda future: slots.release())
+        self.fetches.append(fetch)
+        return fetch
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # nothing submitted here may outlive the request
+        for fetch in self.fetches:
+            if fetch._future is not None and not fetch._done:
+                fetch._future.cancel()
+        return False
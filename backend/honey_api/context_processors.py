@@ -0,0 +1,31 @@
+from django.conf import settings
+
+from honey_api import versions
+
+
+class FragmentCache:
+    """
+    Catalog version stamps for {% cache %} fragments, so a fragment is re-rendered
+    as soon as the managers bump its tag:
+
+        {% cache fragment_cache.timeout 'shop_card' product.slug fragment_cache.products using=fragment_cache.alias %}
+
+    Versions are looked up only when a template asks for them. The stamps carry
+    RELEASE_ID too: fragments embed hashed static URLs, which a deploy renames.
+    Keep {% csrf_token %} and anything user-specific outside the fragments, they
+    are shared by all visitors.
+    """
+    tags = ('products', 'categories', 'reviews')
+
+    def __init__(self):
+        self.timeout = settings.CATALOG_CACHE_TIMEOUT
+        self.alias = settings.CATALOG_CACHE_ALIAS
+
+    def __getitem__(self, tag):
+        if tag not in self.tags:
+            raise KeyError(tag)
+        return f'{settings.RELEASE_ID}:{versions.current(tag)}'
+
+
+def fragment_cache(request):
+    return {'fragment_cache': FragmentCache()}
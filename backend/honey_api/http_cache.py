@@ -0,0 +1,95 @@
+import calendar
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from honey_api import versions
+
+# Conditional GET for catalog pages. Visitors without a session or pending
+# messages all see the same page, so its ETag / Last-Modified come from the
+# catalog version counters alone and If-None-Match is answered with a 304
+# before the view runs. Every catalog page leaves the view as private;
+# SharedCacheMiddleware (above the session and csrf middleware, so it sees
+# the cookies they set) makes a shared one public for PAGE_CACHE_MAX_AGE
+# seconds, for a reverse proxy or CDN in front of the load balancer, once it
+# is sure no visitor-specific cookie or csrf token goes out with it.
+
+
+def _shared(request):
+    return (settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and CookieStorage.cookie_name not in request.COOKIES)
+
+
+def _validators(snapshot, tags, request):
+    parts = [settings.RELEASE_ID, request.path, request.META.get('QUERY_STRING', ''),
+             # pages embed a csrf token derived from this cookie
+             request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+    parts += [f"{tag}:{snapshot.get(tag, {}).get('version', 0)}" for tag in tags]
+    etag = '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    modified = [snapshot[tag]['modified_at'] for tag in tags if snapshot.get(tag, {}).get('modified_at')]
+    # pymongo returns naive UTC datetimes
+    last_modified = calendar.timegm(max(modified).utctimetuple()) if modified else None
+    return etag, last_modified
+
+
+def _candidate(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        response.shared_cache = True
+    return _private(response)
+
+
+def _private(response):
+    patch_cache_control(response, private=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def publish(request, response):
+    """Make a shared catalog page public, unless it hands this visitor a cookie or a fresh csrf token."""
+    if not getattr(response, 'shared_cache', False):
+        return response
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    # get_token() re-sends an unchanged csrf cookie only to renew its expiry; that can go
+    renewal = response.cookies.get(settings.CSRF_COOKIE_NAME)
+    if renewal is not None and renewal.value == csrf_cookie:
+        del response.cookies[settings.CSRF_COOKIE_NAME]
+    # without the csrf cookie in the request the page embeds a token minted for this visitor
+    if csrf_cookie and not response.cookies:
+        patch_cache_control(response, public=True, max_age=settings.PAGE_CACHE_MAX_AGE)
+    return response
+
+
+def catalog_page(*tags):
+    """Validators and Cache-Control for a catalog view that depends on the given version tags."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if not _shared(request):
+                    return _private(await view(request, *args, **kwargs))
+                etag, last_modified = _validators(await versions.asnapshot(), tags, request)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _candidate(response, etag, last_modified)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if not _shared(request):
+                    return _private(view(request, *args, **kwargs))
+                etag, last_modified = _validators(versions.snapshot(), tags, request)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _candidate(response, etag, last_modified)
+        return inner
+    return decorator
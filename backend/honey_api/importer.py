@@ -0,0 +1,196 @@
+import csv
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from honey_api.cache import invalidate_tags
+from honey_api.mongo_models import categories, products
+from honey_api.utils import SlugAllocator
+from mongodb_connector import mongodb
+
+# Streaming catalog import. Rows are read one at a time from CSV or JSONL,
+# validated and turned into product documents in chunks; slugs and categories
+# are resolved for a whole chunk in memory, and each chunk is one unordered
+# insert_many, optionally handed to a pool of worker processes.
+#
+# Columns / keys: title, price (required), category, description, images
+# (JSONL list or '|' separated in CSV). Unknown categories are created.
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.categories_created = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.read / elapsed if elapsed else 0.0
+
+
+def read_rows(path, file_format=None):
+    path = Path(path)
+    file_format = file_format or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            for line, row in enumerate(csv.DictReader(handle), start=2):
+                if row.get('images'):
+                    row['images'] = [image for image in row['images'].split('|') if image]
+                yield line, row
+        else:
+            for line, text in enumerate(handle, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+def _validate(row):
+    title = (row.get('title') or '').strip()
+    if not title:
+        raise ValueError('title is required')
+    price = float(row.get('price'))
+    if price < 0:
+        raise ValueError('price must not be negative')
+    return {
+        'title': title,
+        'price': price,
+        'category': (row.get('category') or '').strip(),
+        'description': row.get('description') or '',
+        'images': row.get('images') or [],
+    }
+
+
+def _chunks(rows, size, stats):
+    chunk = []
+    for line, row in rows:
+        stats.read += 1
+        try:
+            chunk.append(_validate(row))
+        except (TypeError, ValueError, AttributeError) as e:
+            stats.invalid += 1
+            if len(stats.errors) < 20:
+                stats.errors.append(f"line {line}: {e}")
+            continue
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CategoryResolver:
+    """Category name or slug -> _id, creating unknown categories in bulk."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.ids = {}
+        for category in categories.collection.find({}, {'name': 1, 'slug': 1}):
+            self.ids[category['name'].lower()] = category['_id']
+            self.ids[category['slug']] = category['_id']
+        self.slugs = SlugAllocator(categories.collection_name)
+
+    def resolve(self, names):
+        missing = {}
+        for name in names:
+            if name and name.lower() not in self.ids:
+                missing.setdefault(name.lower(), name)
+        missing = list(missing.values())
+        if missing:
+            slugs = self.slugs.allocate(missing)
+            documents = [categories.build_category(name, slug) for name, slug in zip(missing, slugs)]
+            for document, object_id in zip(documents, categories.create_many(documents)):
+                self.ids[document['name'].lower()] = object_id
+                self.ids[document['slug']] = object_id
+            self.stats.categories_created += len(missing)
+        return [self.ids.get(name.lower()) if name else None for name in names]
+
+
+def _slug_clash(error):
+    # like create_with_slug: no keyPattern (older servers) is taken as the slug index
+    key_pattern = error.get('keyPattern')
+    return key_pattern is None or 'slug' in key_pattern
+
+
+def insert_products(documents):
+    """
+    Insert one chunk; returns (inserted, duplicates, errors). Runs in worker processes too.
+    A row whose slug was taken in the meantime (another import, a product created from
+    the admin) is retried with a fresh slug instead of being dropped.
+    """
+    try:
+        inserted = len(mongodb.database['products'].insert_many(documents, ordered=False).inserted_ids)
+        return inserted, 0, []
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != 11000 for error in write_errors):
+            raise
+        inserted = e.details.get('nInserted', 0)
+
+    duplicates, errors = 0, []
+    for error in write_errors:
+        document = documents[error['index']]
+        if not _slug_clash(error):
+            duplicates += 1
+            continue
+        try:
+            products.create_with_slug(document['title'], lambda slug: {**document, 'slug': slug})
+            inserted += 1
+        except DuplicateKeyError as e:
+            errors.append(f"{document['title']!r}: no free slug ({e})")
+    return inserted, duplicates, errors
+
+
+def import_catalog(path, file_format=None, chunk_size=1000, workers=1, progress=None):
+    stats = ImportStats()
+    resolver = CategoryResolver(stats)
+    slugs = SlugAllocator(products.collection_name)
+
+    def build(chunk):
+        category_ids = resolver.resolve([row['category'] for row in chunk])
+        product_slugs = slugs.allocate([row['title'] for row in chunk])
+        return [
+            products.build_product(row['title'], slug, category_id, row['price'], row['description'], row['images'])
+            for row, slug, category_id in zip(chunk, product_slugs, category_ids)
+        ]
+
+    def record(result):
+        inserted, duplicates, errors = result
+        stats.inserted += inserted
+        stats.duplicates += duplicates
+        stats.errors.extend(errors[:max(0, 20 - len(stats.errors))])
+        stats.failed += len(errors)
+        if progress:
+            progress(stats)
+
+    chunks = _chunks(read_rows(path, file_format), chunk_size, stats)
+    try:
+        if workers <= 1:
+            for chunk in chunks:
+                record(insert_products(build(chunk)))
+        else:
+            # the connector builds a fresh client in each forked worker
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                pending = set()
+                for chunk in chunks:
+                    # bounded in-flight chunks keep memory flat on huge files
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            record(future.result())
+                    pending.add(pool.submit(insert_products, build(chunk)))
+                for future in pending:
+                    record(future.result())
+    finally:
+        invalidate_tags('products', 'categories')
+
+    return stats
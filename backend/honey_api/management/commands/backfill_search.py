@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from honey_api.search import backfill_search_fields
+
+
+class Command(BaseCommand):
+    help = "Fill the normalized search fields (title_lower) on existing products."
+
+    def handle(self, *args, **options):
+        modified = backfill_search_fields()
+        self.stdout.write(f"Updated {modified} product(s).")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from honey_api.mongo_models import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild co-purchase counts from orders and the related-products table for every product."
+
+    def handle(self, *args, **options):
+        recommendations.rebuild()
+        self.stdout.write("Recommendations rebuilt.")
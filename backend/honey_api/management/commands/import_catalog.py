@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from honey_api.importer import import_catalog
+
+
+class Command(BaseCommand):
+    help = "Stream products from a CSV or JSONL file into MongoDB in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="file format, guessed from the extension by default")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="products per insert_many")
+        parser.add_argument('--workers', type=int, default=1, help="processes inserting chunks in parallel")
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(f"\r{stats.inserted} imported, {stats.rows_per_second:,.0f} rows/s", ending='')
+            self.stdout.flush()
+
+        try:
+            stats = import_catalog(options['path'], options['format'], options['chunk_size'],
+                                   options['workers'], progress)
+        except FileNotFoundError as e:
+            raise CommandError(e)
+
+        self.stdout.write('')
+        for error in stats.errors:
+            self.stderr.write(f"skipped {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {stats.read} row(s) at {stats.rows_per_second:,.0f} rows/s: {stats.inserted} imported, "
+            f"{stats.invalid} invalid, {stats.duplicates} duplicate(s), {stats.failed} failed, "
+            f"{stats.categories_created} new categor{'y' if stats.categories_created == 1 else 'ies'}."
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from honey_api.mongo_models import managers
+from mongodb_connector import mongodb
+
+
+class Command(BaseCommand):
+    help = "Create the MongoDB indexes declared on the honey_api managers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report differences, do not change anything.")
+        parser.add_argument('--drop', action='store_true',
+                            help="Drop undeclared indexes and rebuild changed ones.")
+
+    def handle(self, *args, **options):
+        mongodb.wait_until_ready()
+
+        for manager in managers:
+            if options['dry_run']:
+                missing, changed, extra = manager.index_status()
+            else:
+                missing, changed, extra = manager.ensure_indexes(drop=options['drop'])
+
+            name = manager.collection_name
+            if not (missing or changed or extra):
+                self.stdout.write(f"{name}: up to date")
+                continue
+
+            for index in missing:
+                self.stdout.write(f"{name}: missing {index}" if options['dry_run'] else f"{name}: created {index}")
+            for index in changed:
+                if options['drop'] and not options['dry_run']:
+                    self.stdout.write(f"{name}: rebuilt {index}")
+                else:
+                    self.stdout.write(self.style.WARNING(f"{name}: {index} differs from its declaration (use --drop to rebuild)"))
+            for index in extra:
+                if options['drop'] and not options['dry_run']:
+                    self.stdout.write(f"{name}: dropped {index}")
+                else:
+                    self.stdout.write(f"{name}: undeclared index {index}")
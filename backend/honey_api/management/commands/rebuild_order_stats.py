@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from honey_api.mongo_models import orders
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's order count and total spend from the orders collection."
+
+    def handle(self, *args, **options):
+        orders.rebuild_stats()
+        self.stdout.write("Order stats rebuilt.")
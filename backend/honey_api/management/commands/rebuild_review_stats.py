@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from honey_api.mongo_models import reviews
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-product and per-user review aggregates from the reviews collection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true',
+                            help="Only seed products and users that have no aggregates yet (safe while serving).")
+
+    def handle(self, *args, **options):
+        reviews.rebuild_aggregates(missing_only=options['missing'])
+        self.stdout.write("Missing review aggregates seeded." if options['missing'] else "Review aggregates rebuilt.")
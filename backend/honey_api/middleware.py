@@ -0,0 +1,127 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from honey_api import http_cache
+from honey_api.profiling import QueryBudgetExceeded, QueryProfile, profile_queries
+from mongodb_monitoring import current_profile, current_view
+
+logger = logging.getLogger('honey_api.query_budget')
+
+
+class MongoMetricsMiddleware:
+    """
+    Tags every MongoDB command issued while serving a request with the name of
+    the Django view, so slow-command logs point at the code that caused them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = current_view.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    async def __acall__(self, request):
+        token = current_view.set(request.path)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        current_view.set(match.view_name if match else view_func.__name__)
+
+
+class SharedCacheMiddleware:
+    """
+    Lets anonymous catalog pages (honey_api.http_cache.catalog_page) be cached
+    publicly. Sits above SessionMiddleware and CsrfViewMiddleware so the
+    response it inspects already carries every cookie they add.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return http_cache.publish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return http_cache.publish(request, await self.get_response(request))
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts and times the MongoDB commands and SQL queries behind each request,
+    reports them in a Server-Timing header and flags requests that go over
+    the QUERY_BUDGET_* settings or repeat one query shape (N+1). With
+    QUERY_BUDGET_STRICT the request fails instead, which is meant for CI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        request.query_budget = {}
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        return self._report(request, response, profile)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return await self.get_response(request)
+
+        request.query_budget = {}
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        await sync_to_async(profile.install_sql_wrappers)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(profile.remove_sql_wrappers)()
+            current_profile.reset(token)
+        return self._report(request, response, profile)
+
+    def _report(self, request, response, profile):
+        response['Server-Timing'] = profile.server_timing()
+        problems = profile.problems(**request.query_budget)
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(problems)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning('query budget exceeded: %s', message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget and hasattr(request, 'query_budget'):
+            request.query_budget = budget
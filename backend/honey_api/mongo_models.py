@@ -1,64 +1,313 @@
+import logging
+
 from mongodb_connector import mongodb
 from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from honey_api.utils import (
+    get_object_id, generate_unique_slug, generate_order_number, get_products_by_slug, order_total,
+)
+from honey_api.search import normalize_title
+from honey_api.cache import invalidate_tags
 
-from honey_api.utils import get_object_id, generate_unique_slug, generate_order_number
+logger = logging.getLogger(__name__)
 
 class BaseMongoModel:
+    indexes = []
+
     def __init__(self, collection_name):
         self.collection_name = collection_name
-        self.collection = mongodb.database[collection_name]
+
+    @property
+    def collection(self):
+        return mongodb.database[self.collection_name]
+
+    @property
+    def catalog_collection(self):
+        return mongodb.catalog_database[self.collection_name]
+
+    @property
+    def async_collection(self):
+        return mongodb.async_database[self.collection_name]
+
+    @property
+    def async_catalog_collection(self):
+        return mongodb.async_catalog_database[self.collection_name]
     
     def create(self, data):
         self.collection.insert_one(data)
 
+    def create_with_slug(self, title, build, attempts=5):
+        """
+        Insert build(slug) with a fresh slug for title. The unique slug index is
+        the final arbiter, so a clash just draws the next slug and tries again.
+        """
+        for _ in range(attempts - 1):
+            data = build(generate_unique_slug(self.collection_name, title))
+            try:
+                self.create(data)
+                return data
+            except DuplicateKeyError as e:
+                key_pattern = (e.details or {}).get('keyPattern')
+                if key_pattern is not None and 'slug' not in key_pattern:
+                    raise
+        data = build(generate_unique_slug(self.collection_name, title))
+        self.create(data)
+        return data
+
+    def bulk_upsert(self, operations):
+        """
+        Unordered bulk_write of upserts. Two requests upserting the same new
+        document race on its unique key; the loser's retry finds the winner's
+        document and updates it instead.
+        """
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            self.collection.bulk_write([operations[error['index']] for error in errors], ordered=False)
+
+    def create_many(self, documents):
+        # unordered: one bad document (e.g. a duplicate slug) does not stop the rest of the batch
+        return self.collection.insert_many(documents, ordered=False).inserted_ids
+
+    def index_status(self):
+        """
+        Compare declared indexes with the server.
+        Returns (missing, changed, extra) lists of index names.
+        """
+        existing = self.collection.index_information()
+        declared = {index.document['name']: index.document for index in self.indexes}
+
+        missing, changed = [], []
+        for name, spec in declared.items():
+            if name not in existing:
+                missing.append(name)
+            elif not _same_index(spec, existing[name]):
+                changed.append(name)
+
+        extra = [name for name in existing if name != '_id_' and name not in declared]
+        return missing, changed, extra
+
+    def ensure_indexes(self, drop=False):
+        missing, changed, extra = self.index_status()
+
+        if drop:
+            for name in changed + extra:
+                self.collection.drop_index(name)
+            missing = missing + changed
+
+        to_create = [index for index in self.indexes if index.document['name'] in missing]
+        if to_create:
+            self.collection.create_indexes(to_create)
+
+        return missing, changed, extra
+
+
+def _same_index(declared, existing):
+    text_fields = [field for field, kind in declared['key'].items() if kind == TEXT]
+    if text_fields:
+        # the server reports text indexes as _fts/_ftsx plus their weights
+        if ('_fts', TEXT) not in [tuple(key) for key in existing['key']]:
+            return False
+        weights = declared.get('weights') or {field: 1 for field in text_fields}
+        return existing.get('weights') == weights
+
+    if list(declared['key'].items()) != [tuple(key) for key in existing['key']]:
+        return False
+    for option in ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds'):
+        if declared.get(option) != existing.get(option):
+            return False
+    return True
+
 class CategoryManager(BaseMongoModel):
+    indexes = [
+        IndexModel([('slug', ASCENDING)], name='slug_unique', unique=True),
+        IndexModel([('parent_id', ASCENDING)], name='parent_id'),
+    ]
+
     def __init__(self):
         super().__init__('categories')
     
-    def create_category(self, name, description="", parent_id=None):
-        data = {
+    def build_category(self, name, slug, description="", parent_id=None):
+        return {
             'name': name,
-            'slug': generate_unique_slug(self.collection_name, name),
+            'slug': slug,
             'description': description,
             'parent_id': get_object_id(parent_id) if parent_id else None
         }
-        self.create(data)
+
+    def create_category(self, name, description="", parent_id=None):
+        self.create_with_slug(name, lambda slug: self.build_category(name, slug, description, parent_id))
+        invalidate_tags('categories')
+
+    def create_many(self, documents):
+        try:
+            return super().create_many(documents)
+        finally:
+            invalidate_tags('categories')
     
     
 class ProductManager(BaseMongoModel):
+    indexes = [
+        IndexModel([('slug', ASCENDING)], name='slug_unique', unique=True),
+        IndexModel([('title', ASCENDING)], name='title'),
+        IndexModel([('price', ASCENDING)], name='price'),
+        IndexModel([('category_id', ASCENDING), ('title', ASCENDING)], name='category_id_title'),
+        IndexModel([('category_id', ASCENDING), ('price', ASCENDING)], name='category_id_price'),
+        IndexModel([('title_lower', ASCENDING)], name='title_lower'),
+        IndexModel([('title', TEXT), ('description', TEXT)], name='title_description_text',
+                   weights={'title': 10, 'description': 2}),
+    ]
+
     def __init__(self):
         super().__init__('products')
     
-    def create_product(self, title, category_id, price, description):
-        data = {
+    def build_product(self, title, slug, category_id, price, description, images=None):
+        return {
             'title': title,
-            'slug': generate_unique_slug(self.collection_name, title),
-            'category_id': get_object_id(category_id),
+            'title_lower': normalize_title(title),
+            'slug': slug,
+            'category_id': get_object_id(category_id) if category_id else None,
             'price': float(price),
             'description': description,
-            'images': [],
+            'images': images or [],
             'status': 'active',
+            # review aggregates (ReviewManager) exist from the start and only move with $inc
+            'review_count': 0,
+            'rating_sum': 0,
+            'rating_histogram': {},
             'modified_at': datetime.now()
         }
-        self.create(data)
+
+    def create_product(self, title, category_id, price, description):
+        self.create_with_slug(title, lambda slug: self.build_product(title, slug, category_id, price, description))
+        invalidate_tags('products')
+
+    def create_many(self, documents):
+        try:
+            return super().create_many(documents)
+        finally:
+            invalidate_tags('products')
     
 
 class ReviewManager(BaseMongoModel):
+    indexes = [
+        IndexModel([('product_slug', ASCENDING), ('date', DESCENDING)], name='product_slug_date'),
+        IndexModel([('user_id', ASCENDING), ('product_slug', ASCENDING)], name='user_id_product_slug'),
+    ]
+
     def __init__(self):
         super().__init__('reviews')
     
     def create_review(self, user_id, product_slug, rating, comment):
+        rating = int(rating)
+        if not 1 <= rating <= 5:
+            raise ValueError("Rating must be between 1 and 5.")
+
         data = {
             'user_id': int(user_id),  
             'product_slug': product_slug,
-            'rating': int(rating),
+            'rating': rating,
             'comment': comment,
             'date': datetime.now()
         }
         self.create(data)
+
+        # denormalized aggregates: per product on the product document, per user in user_stats.
+        # They only move with $inc; products and users whose reviews predate them are seeded
+        # up front by `rebuild_review_stats --missing` (docker/entrypoint.sh), and a full
+        # `rebuild_review_stats` repairs any drift.
+        database = mongodb.database
+        database['products'].update_one(
+            {'slug': product_slug},
+            {'$inc': {'review_count': 1, 'rating_sum': rating, f'rating_histogram.{rating}': 1}},
+        )
+        database['user_stats'].update_one({'_id': int(user_id)}, {'$inc': {'review_count': 1}}, upsert=True)
+        invalidate_tags('reviews')
+
+    def user_review_count(self, user_id, user_stats=None):
+        """A user's review count from user_stats or, before their counter exists, the reviews."""
+        if user_stats is None:
+            user_stats = mongodb.database['user_stats'].find_one({'_id': user_id}) or {}
+        if 'review_count' in user_stats:
+            return user_stats['review_count']
+        return self.collection.count_documents({'user_id': user_id})
+
+    def _product_stats(self, match=None):
+        pipeline = [{'$match': match}] if match else []
+        return self.collection.aggregate(pipeline + [
+            {'$group': {
+                '_id': {'slug': '$product_slug', 'rating': '$rating'},
+                'count': {'$sum': 1},
+            }},
+            {'$group': {
+                '_id': '$_id.slug',
+                'review_count': {'$sum': '$count'},
+                'rating_sum': {'$sum': {'$multiply': ['$_id.rating', '$count']}},
+                'histogram': {'$push': {'k': {'$toString': '$_id.rating'}, 'v': '$count'}},
+            }},
+        ])
+
+    @staticmethod
+    def _product_fields(stats):
+        return {
+            'review_count': stats['review_count'],
+            'rating_sum': stats['rating_sum'],
+            'rating_histogram': {item['k']: item['v'] for item in stats['histogram']},
+        }
+
+    def rebuild_aggregates(self, missing_only=False):
+        """
+        Recompute the per-product and per-user review aggregates from the reviews
+        collection. With missing_only, only seed products and users that have none
+        yet and leave the counters that exist alone.
+        """
+        database = mongodb.database
+        empty = {'review_count': 0, 'rating_sum': 0, 'rating_histogram': {}}
+
+        if missing_only:
+            unseeded = {'review_count': {'$exists': False}}
+            slugs = [doc['slug'] for doc in database['products'].find(unseeded, {'slug': 1})]
+            product_stats = self._product_stats({'product_slug': {'$in': slugs}}) if slugs else []
+        else:
+            unseeded = {}
+            product_stats = self._product_stats()
+            database['products'].update_many({}, {'$set': empty})
+        updates = [
+            UpdateOne({'slug': stats['_id'], **unseeded}, {'$set': self._product_fields(stats)})
+            for stats in product_stats
+        ]
+        if updates:
+            database['products'].bulk_write(updates, ordered=False)
+        if missing_only:
+            # whatever is still unseeded has no reviews
+            database['products'].update_many(unseeded, {'$set': empty})
+
+        user_stats = self.collection.aggregate([{'$group': {'_id': '$user_id', 'review_count': {'$sum': 1}}}])
+        seeded = set()
+        if missing_only:
+            seeded = {doc['_id'] for doc in database['user_stats'].find({'review_count': {'$exists': True}}, {'_id': 1})}
+        else:
+            database['user_stats'].update_many({}, {'$set': {'review_count': 0}})
+        updates = [
+            UpdateOne({'_id': stats['_id']}, {'$set': {'review_count': stats['review_count']}}, upsert=True)
+            for stats in user_stats if stats['_id'] not in seeded
+        ]
+        if updates:
+            database['user_stats'].bulk_write(updates, ordered=False)
+
+        invalidate_tags('reviews')
     
 
 class CartManager(BaseMongoModel):
+    indexes = [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+    ]
+
     def __init__(self):
         super().__init__('carts')
     
@@ -69,11 +318,267 @@ class CartManager(BaseMongoModel):
             'total_amount': 0.0
         }
         self.create(cart_data)
+
+    def get_or_create(self, user_id):
+        return self.collection.find_one_and_update(
+            {'user_id': int(user_id)},
+            {'$setOnInsert': {'items': [], 'total_amount': 0.0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def aget_or_create(self, user_id):
+        return await self.async_collection.find_one_and_update(
+            {'user_id': int(user_id)},
+            {'$setOnInsert': {'items': [], 'total_amount': 0.0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def add_item(self, user_id, product_slug, quantity, price):
+        user_id = int(user_id)
+        amount = quantity * price
+
+        result = self.collection.update_one(
+            {'user_id': user_id, 'items.product_slug': product_slug},
+            {'$inc': {'items.$.quantity': quantity, 'total_amount': amount}},
+        )
+        if result.matched_count:
+            return
+
+        try:
+            self.collection.update_one(
+                {'user_id': user_id, 'items.product_slug': {'$ne': product_slug}},
+                {
+                    '$push': {'items': {'product_slug': product_slug, 'quantity': quantity, 'price': price}},
+                    '$inc': {'total_amount': amount},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # another request pushed the same product in between, bump its quantity instead
+            self.collection.update_one(
+                {'user_id': user_id, 'items.product_slug': product_slug},
+                {'$inc': {'items.$.quantity': quantity, 'total_amount': amount}},
+            )
+
+    def remove_item(self, user_id, product_slug):
+        removed = {'$filter': {'input': '$items', 'cond': {'$eq': ['$$this.product_slug', product_slug]}}}
+        self.collection.update_one({'user_id': int(user_id)}, [
+            {'$set': {'total_amount': {'$subtract': [
+                {'$ifNull': ['$total_amount', 0]},
+                {'$sum': {'$map': {
+                    'input': removed,
+                    'in': {'$multiply': ['$$this.quantity', {'$ifNull': ['$$this.price', 0]}]},
+                }}},
+            ]}}},
+            {'$set': {'items': {'$filter': {
+                'input': '$items', 'cond': {'$ne': ['$$this.product_slug', product_slug]},
+            }}}},
+        ])
+
+    def clear(self, user_id):
+        """Empty the cart and return whether it had any items."""
+        previous = self.collection.find_one_and_update(
+            {'user_id': int(user_id)},
+            {'$set': {'items': [], 'total_amount': 0.0}},
+            projection={'items': {'$slice': 1}},
+        )
+        return bool(previous and previous.get('items'))
     
 
 class OrderManager(BaseMongoModel):
+    indexes = [
+        IndexModel([('user_id', ASCENDING), ('date', DESCENDING)], name='user_id_date'),
+        IndexModel([('order_number', ASCENDING)], name='order_number_unique', unique=True),
+        # a retried checkout POST carries the same key and cannot create a second order
+        IndexModel([('user_id', ASCENDING), ('idempotency_key', ASCENDING)], name='user_id_idempotency_key_unique',
+                   unique=True, partialFilterExpression={'idempotency_key': {'$type': 'string'}}),
+    ]
+
     def __init__(self):
         super().__init__('orders')
+        self._transactions = None
+
+    def supports_transactions(self):
+        # multi-document transactions need a replica set or a sharded cluster
+        if self._transactions is None:
+            hello = mongodb.database.command('hello')
+            self._transactions = bool(hello.get('setName') or hello.get('msg') == 'isdbgrid')
+        return self._transactions
+
+    def price_items(self, cart_items):
+        """Order lines priced from the current catalog, with title and price snapshotted."""
+        products = get_products_by_slug((item['product_slug'] for item in cart_items),
+                                        fields=('title', 'price'), primary=True)
+        items = []
+        for item in cart_items:
+            product = products.get(item['product_slug'])
+            if not product or item['quantity'] < 1:
+                continue
+            items.append({
+                'product_slug': item['product_slug'],
+                'title': product['title'],
+                'price': product['price'],
+                'quantity': item['quantity'],
+                'total_amount': round(product['price'] * item['quantity'], 2),
+            })
+        return items
+
+    def place_order(self, user_id, address_id, idempotency_key):
+        """
+        Turn the user's cart into an order: items are repriced server-side, the
+        order is written and its lines taken out of the cart in one transaction (or in two
+        steps that a retry with the same key completes), and a key that was
+        already used returns the existing order. Returns (order, created).
+        """
+        user_id = int(user_id)
+        existing = self.collection.find_one({'user_id': user_id, 'idempotency_key': idempotency_key})
+        if existing:
+            self._finish(existing)
+            return existing, False
+
+        try:
+            if self.supports_transactions():
+                # the cart is read inside the transaction, so an item added meanwhile makes the
+                # cart update conflict and the whole callback retry with the new cart
+                with mongodb.client.start_session() as session:
+                    order = session.with_transaction(
+                        lambda s: self._write(user_id, address_id, idempotency_key, s))
+            else:
+                order = self._build(carts.collection.find_one({'user_id': user_id}),
+                                    user_id, address_id, idempotency_key)
+                self.collection.insert_one(order)
+                self._finish(order)
+        except DuplicateKeyError:
+            # a concurrent retry with the same key got there first
+            existing = self.collection.find_one({'user_id': user_id, 'idempotency_key': idempotency_key})
+            if existing is None:
+                raise
+            self._finish(existing)
+            return existing, False
+
+        recommendations.record_order(order['items'])
+        return order, True
+
+    def _build(self, cart, user_id, address_id, idempotency_key):
+        items = self.price_items(cart['items'] if cart else [])
+        if not items:
+            raise ValueError("Your cart is empty.")
+
+        ordered = {item['product_slug'] for item in items}
+        subtotal = round(sum(item['total_amount'] for item in items), 2)
+        return {
+            'user_id': user_id,
+            'items': items,
+            'subtotal': subtotal,
+            'total_amount': order_total(subtotal),
+            'payment_status': 'pending',
+            'order_status': 'processing',
+            'address_id': address_id,
+            'order_number': generate_order_number(),
+            'idempotency_key': idempotency_key,
+            'cart_id': cart['_id'],
+            # the cart lines this order took, as they were in the cart
+            'cart_items': [item for item in cart['items'] if item['product_slug'] in ordered],
+            'cart_cleared': False,
+            'date': datetime.now()
+        }
+
+    def _write(self, user_id, address_id, idempotency_key, session):
+        cart = carts.collection.find_one({'user_id': user_id}, session=session)
+        order = self._build(cart, user_id, address_id, idempotency_key)
+        order['cart_cleared'] = True
+        self.collection.insert_one(order, session=session)
+        self._release_cart(order, session)
+        self._count(order, session)
+        return order
+
+    def _release_cart(self, order, session=None):
+        # take out only what was ordered: lines added or topped up in another tab stay in the cart
+        cart_id = order['cart_id']
+        updates = [
+            UpdateOne({'_id': cart_id, 'items.product_slug': item['product_slug']},
+                      {'$inc': {'items.$.quantity': -item['quantity'],
+                                'total_amount': -item['quantity'] * item.get('price', 0)}})
+            for item in order.get('cart_items', order['items'])
+        ]
+        updates += [
+            UpdateOne({'_id': cart_id}, {'$pull': {'items': {'quantity': {'$lte': 0}}}}),
+            UpdateOne({'_id': cart_id, 'items': {'$size': 0}}, {'$set': {'total_amount': 0.0}}),
+        ]
+        carts.collection.bulk_write(updates, ordered=True, session=session)
+
+    def _finish(self, order):
+        # second step without transactions; a no-op once the cart was released.
+        # Only the caller that flips the flag releases the cart and counts the order.
+        if order.get('cart_cleared', True):
+            return
+        flipped = self.collection.update_one({'_id': order['_id'], 'cart_cleared': False},
+                                             {'$set': {'cart_cleared': True}})
+        if flipped.modified_count:
+            self._release_cart(order)
+            self._count(order)
+        order['cart_cleared'] = True
+
+    def _count(self, order, session=None):
+        # denormalized per-user totals for the profile page, next to review_count
+        user_stats = mongodb.database['user_stats']
+        result = user_stats.update_one(
+            {'_id': order['user_id'], 'order_count': {'$exists': True}},
+            {'$inc': {'order_count': 1, 'total_spend': order['total_amount']}},
+            session=session,
+        )
+        if result.matched_count:
+            return
+
+        # first order since the counters were added: seed them from the user's orders, this one
+        # included but not other two-step orders still waiting for their own _count
+        totals = list(self.collection.aggregate([
+            {'$match': {'user_id': order['user_id'],
+                        '$or': [{'cart_cleared': {'$ne': False}}, {'_id': order['_id']}]}},
+            {'$group': {'_id': None, 'order_count': {'$sum': 1}, 'total_spend': {'$sum': '$total_amount'}}},
+        ], session=session))
+        if totals:
+            # $max: of two concurrent seeds the later one is complete
+            user_stats.update_one(
+                {'_id': order['user_id']},
+                {'$max': {'order_count': totals[0]['order_count'], 'total_spend': totals[0]['total_spend']}},
+                upsert=True, session=session,
+            )
+
+    def stats(self, user_id, user_stats=None):
+        """(order_count, total_spend) for a user, from user_stats or, before their first new order, an aggregation."""
+        user_id = int(user_id)
+        if user_stats is None:
+            user_stats = mongodb.database['user_stats'].find_one({'_id': user_id}) or {}
+        if 'order_count' in user_stats:
+            return user_stats['order_count'], user_stats.get('total_spend', 0)
+
+        totals = list(self.collection.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$group': {'_id': None, 'order_count': {'$sum': 1}, 'total_spend': {'$sum': '$total_amount'}}},
+        ]))
+        if not totals:
+            return 0, 0
+        return totals[0]['order_count'], totals[0]['total_spend']
+
+    def rebuild_stats(self):
+        """Recompute every user's order_count and total_spend from the orders collection."""
+        database = mongodb.database
+        user_stats = self.collection.aggregate([
+            {'$group': {'_id': '$user_id', 'order_count': {'$sum': 1}, 'total_spend': {'$sum': '$total_amount'}}},
+        ])
+        database['user_stats'].update_many({}, {'$set': {'order_count': 0, 'total_spend': 0}})
+        updates = [
+            UpdateOne({'_id': stats['_id']}, {'$set': {
+                'order_count': stats['order_count'],
+                'total_spend': stats['total_spend'],
+            }}, upsert=True)
+            for stats in user_stats
+        ]
+        if updates:
+            database['user_stats'].bulk_write(updates, ordered=False)
     
     def create_order(self, user_id, items, total_amount, address_id):
         data = {
@@ -86,11 +591,176 @@ class OrderManager(BaseMongoModel):
             'order_number': generate_order_number(),
             'date': datetime.now()
         }
-        return self.create(data)
+        result = self.create(data)
+        self._count(data)
+        recommendations.record_order(items)
+        return result
+
+
+class ProductPairManager(BaseMongoModel):
+    """How often two products were bought in the same order, one document per direction."""
+
+    indexes = [
+        IndexModel([('product_slug', ASCENDING), ('related_slug', ASCENDING)],
+                   name='product_slug_related_slug_unique', unique=True),
+        IndexModel([('product_slug', ASCENDING), ('count', DESCENDING)], name='product_slug_count'),
+    ]
+
+    def __init__(self):
+        super().__init__('product_pairs')
+
+    def record(self, slugs):
+        slugs = sorted(set(slugs))
+        updates = [
+            UpdateOne({'product_slug': a, 'related_slug': b}, {'$inc': {'count': 1}}, upsert=True)
+            for a in slugs for b in slugs if a != b
+        ]
+        if updates:
+            self.bulk_upsert(updates)
+
+    def rebuild(self):
+        mongodb.database['orders'].aggregate([
+            {'$project': {'slugs': {'$setUnion': ['$items.product_slug', []]}}},
+            {'$project': {'product_slug': '$slugs', 'related_slug': '$slugs'}},
+            {'$unwind': '$product_slug'},
+            {'$unwind': '$related_slug'},
+            {'$match': {'$expr': {'$ne': ['$product_slug', '$related_slug']}}},
+            {'$group': {'_id': {'product_slug': '$product_slug', 'related_slug': '$related_slug'}, 'count': {'$sum': 1}}},
+            {'$project': {'_id': 0, 'product_slug': '$_id.product_slug', 'related_slug': '$_id.related_slug', 'count': 1}},
+            {'$out': self.collection_name},
+        ])
+
+    def top(self, product_slugs, limit):
+        """{product_slug: [{related_slug, count}, ...]} with the `limit` most co-bought products of each."""
+        results = self.collection.aggregate([
+            {'$match': {'product_slug': {'$in': list(product_slugs)}}},
+            # $topN keeps only `limit` pairs per product while grouping (MongoDB >= 5.2)
+            {'$group': {'_id': '$product_slug',
+                        'pairs': {'$topN': {'n': limit, 'sortBy': {'count': DESCENDING},
+                                            'output': {'related_slug': '$related_slug', 'count': '$count'}}}}},
+        ])
+        return {result['_id']: result['pairs'] for result in results}
+
+
+class RecommendationManager(BaseMongoModel):
+    """
+    Precomputed related products, one document per product slug:
+    {_id: slug, related: [{slug, title, price, score}], updated_at}.
+    Score is the co-purchase count plus a bonus for sharing the category.
+    """
+
+    limit = 4
+    category_weight = 1
+    rebuild_batch_size = 500
+
+    def __init__(self):
+        super().__init__('recommendations')
+
+    def related(self, product):
+        recommendation = self.catalog_collection.find_one({'_id': product['slug']}, {'related': 1})
+        if recommendation:
+            return recommendation['related']
+
+        # not computed yet: fall back to a bounded same-category query
+        return list(mongodb.catalog_database['products'].find(
+            {'category_id': product['category_id'], 'slug': {'$ne': product['slug']}},
+            {'_id': 0, 'slug': 1, 'title': 1, 'price': 1},
+            limit=self.limit,
+        ))
+
+    async def arelated(self, product):
+        recommendation = await self.async_catalog_collection.find_one({'_id': product['slug']}, {'related': 1})
+        if recommendation:
+            return recommendation['related']
+
+        return await mongodb.async_catalog_database['products'].find(
+            {'category_id': product['category_id'], 'slug': {'$ne': product['slug']}},
+            {'_id': 0, 'slug': 1, 'title': 1, 'price': 1},
+            limit=self.limit,
+        ).to_list()
+
+    def _same_category(self, category_ids, limit):
+        """{category_id: [slug, ...]}, up to `limit` products of each category."""
+        results = mongodb.database['products'].aggregate([
+            {'$match': {'category_id': {'$in': list(category_ids)}}},
+            {'$group': {'_id': '$category_id', 'slugs': {'$firstN': {'n': limit, 'input': '$slug'}}}},
+        ])
+        return {result['_id']: result['slugs'] for result in results}
+
+    def compute(self, products):
+        """{slug: related} for {slug: product}; a fixed number of queries however many products."""
+        pairs = product_pairs.top(products, self.limit * 2)
+        # one extra per category, the product itself is among them
+        same_category = self._same_category({product.get('category_id') for product in products.values()},
+                                            self.limit * 2 + 1)
+
+        scores = {}
+        for slug, product in products.items():
+            product_scores = scores[slug] = {pair['related_slug']: pair['count'] for pair in pairs.get(slug, [])}
+            others = [other for other in same_category.get(product.get('category_id'), []) if other != slug]
+            for other in others[:self.limit * 2]:
+                product_scores.setdefault(other, 0)
+
+        candidates = get_products_by_slug(
+            (other for product_scores in scores.values() for other in product_scores),
+            fields=('title', 'slug', 'price', 'category_id'),
+        )
+        computed = {}
+        for slug, product in products.items():
+            related = []
+            for other, score in scores[slug].items():
+                candidate = candidates.get(other)
+                if not candidate:
+                    continue
+                if candidate.get('category_id') == product.get('category_id'):
+                    score += self.category_weight
+                related.append({'slug': other, 'title': candidate['title'], 'price': candidate['price'],
+                                'score': score})
+            related.sort(key=lambda item: (-item['score'], item['title']))
+            computed[slug] = related[:self.limit]
+        return computed
+
+    def refresh(self, slugs):
+        products = get_products_by_slug(slugs, fields=('slug', 'category_id'))
+        if not products:
+            return
+        now = datetime.now()
+        self.bulk_upsert([
+            ReplaceOne({'_id': slug}, {'related': related, 'updated_at': now}, upsert=True)
+            for slug, related in self.compute(products).items()
+        ])
+
+    def record_order(self, items):
+        """
+        Runs after the order is placed, so it must never fail checkout:
+        recommendations are derived data and `build_recommendations` rebuilds them.
+        """
+        slugs = [item['product_slug'] for item in items]
+        try:
+            product_pairs.record(slugs)
+            self.refresh(slugs)
+        except Exception:
+            logger.exception('could not update recommendations for order items %s', slugs)
+
+    def rebuild(self):
+        product_pairs.rebuild()
+
+        batch = []
+        for product in mongodb.database['products'].find({}, {'slug': 1}):
+            batch.append(product['slug'])
+            if len(batch) >= self.rebuild_batch_size:
+                self.refresh(batch)
+                batch = []
+        if batch:
+            self.refresh(batch)
     
 
 categories = CategoryManager()
 products = ProductManager()
 reviews = ReviewManager()
 carts = CartManager()
-orders = OrderManager()
\ No newline at end of file
+orders = OrderManager()
+product_pairs = ProductPairManager()
+recommendations = RecommendationManager()
+
+managers = [categories, products, reviews, carts, orders, product_pairs, recommendations]
\ No newline at end of file
@@ -0,0 +1,120 @@
+import base64
+
+from bson import json_util
+
+from honey_api.cache import cached
+from honey_api.serializer import mongo_serializer
+
+
+class MongoQuery:
+    """
+    Lazy find() that Django's Paginator can page over: count() is answered by
+    the server and slicing turns into skip/limit, so only one page is fetched.
+    """
+
+    def __init__(self, collection, filters=None, sort=None, projection=None, serializer=mongo_serializer,
+                 cache_namespace=None, cache_tags=()):
+        self.collection = collection
+        self.filters = filters or {}
+        self.sort = list(sort or [])
+        self.projection = projection
+        self.serializer = serializer
+        self.cache_namespace = cache_namespace
+        self.cache_tags = cache_tags
+        self._count = None
+
+        # skip/limit paging needs a total order, otherwise rows can repeat across pages
+        if not any(field == '_id' for field, _ in self.sort):
+            direction = self.sort[-1][1] if self.sort and isinstance(self.sort[-1][1], int) else 1
+            self.sort.append(('_id', direction))
+
+    def _cached(self, key_parts, compute):
+        if not self.cache_namespace:
+            return compute()
+        key_parts = (self.collection.name, self.filters, self.sort, self.projection) + key_parts
+        return cached(self.cache_namespace, key_parts, compute, tags=self.cache_tags)
+
+    def _fetch_count(self):
+        if self.filters:
+            return self.collection.count_documents(self.filters)
+        return self.collection.estimated_document_count()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._cached(('count',), self._fetch_count)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+            stop = key.stop if key.stop is not None else self.count()
+            if stop <= start:
+                return []
+
+            def fetch():
+                cursor = self.collection.find(self.filters, self.projection, sort=self.sort,
+                                              skip=start, limit=stop - start)
+                return self.serializer(list(cursor))
+
+            return self._cached(('slice', start, stop), fetch)
+
+        page = self[key:key + 1]
+        if not page:
+            raise IndexError(key)
+        return page[0]
+
+
+def encode_cursor(value, object_id):
+    return base64.urlsafe_b64encode(json_util.dumps([value, object_id]).encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        value, object_id = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+        return value, object_id
+    except Exception:
+        return None
+
+
+def _keyset_query(filters, sort_field, direction, after):
+    query = dict(filters)
+    position = decode_cursor(after) if after else None
+
+    if position:
+        value, last_id = position
+        op = '$gt' if direction == 1 else '$lt'
+        query = {'$and': [query, {'$or': [
+            {sort_field: {op: value}},
+            {sort_field: value, '_id': {op: last_id}},
+        ]}]}
+    return query
+
+
+def _keyset_result(documents, sort_field, limit):
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['_id'])
+    return documents, next_cursor
+
+
+def keyset_page(collection, filters, sort_field, direction=1, after=None, limit=20, projection=None):
+    """
+    Seek-based paging on (sort_field, _id). Returns the raw documents of one page
+    and the cursor token of the next page, or None on the last page.
+    """
+    documents = list(collection.find(_keyset_query(filters, sort_field, direction, after), projection,
+                                     sort=[(sort_field, direction), ('_id', direction)],
+                                     limit=limit + 1))
+    return _keyset_result(documents, sort_field, limit)
+
+
+async def akeyset_page(collection, filters, sort_field, direction=1, after=None, limit=20, projection=None):
+    """keyset_page for an async (AsyncMongoClient) collection."""
+    cursor = collection.find(_keyset_query(filters, sort_field, direction, after), projection,
+                             sort=[(sort_field, direction), ('_id', direction)], limit=limit + 1)
+    return _keyset_result(await cursor.to_list(), sort_field, limit)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from mongodb_monitoring import current_profile
+
+# command fields that never change the shape of a query
+_IGNORED_FIELDS = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'readConcern',
+                   'writeConcern', 'ordered', 'cursor', 'batchSize', 'limit', 'skip', 'singleBatch',
+                   'startTransaction', 'autocommit', 'maxTimeMS', 'comment'}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(value):
+    """The structure of a query with every literal replaced by '?'."""
+    if isinstance(value, dict):
+        return '{%s}' % ','.join(f'{key}:{query_shape(item)}' for key, item in value.items()
+                                 if key not in _IGNORED_FIELDS)
+    if isinstance(value, (list, tuple)):
+        # an $in over 3 or 30 values is the same query
+        return '[%s]' % (query_shape(value[0]) if value else '')
+    return '?'
+
+
+class QueryProfile:
+    def __init__(self):
+        self.mongo_count = 0
+        self.mongo_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record_mongo(self, collection, command_name, command, seconds):
+        with self._lock:
+            self.mongo_count += 1
+            self.mongo_time += seconds
+            # batches of one big cursor are not an N+1
+            if command_name != 'getMore':
+                self.shapes[f'mongo {command_name} {collection} {query_shape(command)}'] += 1
+
+    def record_sql(self, sql, seconds):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += seconds
+            self.shapes[f'sql {sql}'] += 1
+
+    def _sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record_sql(sql, time.perf_counter() - start)
+
+    def install_sql_wrappers(self):
+        # connections are per thread; async views reach the ORM from sync_to_async's request thread,
+        # so the async middleware calls this (and remove_sql_wrappers) in that thread
+        for connection in connections.all():
+            connection.execute_wrappers.append(self._sql_wrapper)
+
+    def remove_sql_wrappers(self):
+        for connection in connections.all():
+            if self._sql_wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self._sql_wrapper)
+
+    def repeated(self, limit):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > limit]
+
+    def problems(self, mongo=None, sql=None, repeats=None):
+        mongo = settings.QUERY_BUDGET_MONGO if mongo is None else mongo
+        sql = settings.QUERY_BUDGET_SQL if sql is None else sql
+        repeats = settings.QUERY_BUDGET_REPEATS if repeats is None else repeats
+
+        problems = []
+        if self.mongo_count > mongo:
+            problems.append(f'{self.mongo_count} MongoDB commands (budget {mongo})')
+        if self.sql_count > sql:
+            problems.append(f'{self.sql_count} SQL queries (budget {sql})')
+        for shape, count in self.repeated(repeats):
+            problems.append(f'same query repeated {count} times (N+1?): {shape}')
+        return problems
+
+    def server_timing(self):
+        return (f'mongo;dur={self.mongo_time * 1000:.1f};desc="{self.mongo_count} commands", '
+                f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"')
+
+
+@contextmanager
+def profile_queries():
+    """Count and time every MongoDB command and SQL query issued inside the block."""
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    profile.install_sql_wrappers()
+    try:
+        yield profile
+    finally:
+        profile.remove_sql_wrappers()
+        current_profile.reset(token)
+
+
+@contextmanager
+def assert_query_budget(mongo=None, sql=None, repeats=None):
+    """Fail the enclosing test when the block goes over its query budget."""
+    with profile_queries() as profile:
+        yield profile
+    problems = profile.problems(mongo, sql, repeats)
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
+
+
+def query_budget(mongo=None, sql=None, repeats=None):
+    """Per-view override of the QUERY_BUDGET_* settings."""
+    def decorator(view):
+        view.query_budget = {'mongo': mongo, 'sql': sql, 'repeats': repeats}
+        return view
+    return decorator
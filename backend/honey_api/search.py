@@ -0,0 +1,59 @@
+import re
+
+from mongodb_connector import mongodb
+
+TEXT_SCORE = {'$meta': 'textScore'}
+SUGGESTION_LIMIT = 8
+
+
+def normalize_title(title):
+    return (title or '').strip().lower()
+
+
+def text_search(query):
+    """
+    Filter, sort and projection for a relevance-ranked full-text search
+    over the products text index (title and description).
+    """
+    filters = {'$text': {'$search': query}}
+    sort = [('score', TEXT_SCORE)]
+    projection = {'score': TEXT_SCORE}
+    return filters, sort, projection
+
+
+def prefix_filter(prefix):
+    # anchored on the lowercase copy of the title so the title_lower index is used
+    return {'title_lower': {'$regex': '^' + re.escape(normalize_title(prefix))}}
+
+
+def suggest_products(prefix, limit=SUGGESTION_LIMIT):
+    if not normalize_title(prefix):
+        return []
+
+    products = mongodb.catalog_database['products'].find(
+        prefix_filter(prefix),
+        {'_id': 0, 'title': 1, 'slug': 1},
+        sort=[('title_lower', 1)],
+        limit=limit,
+    )
+    return list(products)
+
+
+async def asuggest_products(prefix, limit=SUGGESTION_LIMIT):
+    if not normalize_title(prefix):
+        return []
+
+    return await mongodb.async_catalog_database['products'].find(
+        prefix_filter(prefix),
+        {'_id': 0, 'title': 1, 'slug': 1},
+        sort=[('title_lower', 1)],
+        limit=limit,
+    ).to_list()
+
+
+def backfill_search_fields():
+    result = mongodb.database['products'].update_many(
+        {},
+        [{'$set': {'title_lower': {'$toLower': {'$trim': {'input': '$title'}}}}}],
+    )
+    return result.modified_count
@@ -1,10 +1,9 @@
 from bson import ObjectId
 from datetime import datetime
 from pymongo.cursor import Cursor
-from mongodb_connector import mongodb
 
-from core.models import User
-from honey_api.utils import get_object_id
+from core.utils import get_usernames
+from honey_api.utils import get_products_by_slug, order_total, SHIPPING_FEE, TAX
 
 def mongo_serializer(doc):
     if doc is None:
@@ -35,13 +34,62 @@ def mongo_serializer(doc):
     
     return doc
 
-def cart_serializer(cart):
+
+class CompiledSerializer:
+    """
+    Fast path for documents fetched with `.projection`: the conversion plan
+    is worked out once per schema, so serializing a document is a single pass
+    over the projected fields without type checks or recursion.
+    """
+
+    def __init__(self, fields, object_id_fields=(), nested_fields=()):
+        self.projection = {field: 1 for field in fields}
+        self._converters = {'_id': str}
+        for field in object_id_fields:
+            self._converters[field] = str
+        for field in nested_fields:
+            self._converters[field] = mongo_serializer
+
+    def __call__(self, doc):
+        converters = self._converters
+        serialized = {}
+        for key, value in doc.items():
+            convert = converters.get(key)
+            if convert is not None and value is not None:
+                value = convert(value)
+            serialized['id' if key == '_id' else key] = value
+        return serialized
+
+    def many(self, docs):
+        return [self(doc) for doc in docs]
+
+    def stream(self, docs):
+        for doc in docs:
+            yield self(doc)
+
+
+product_card_serializer = CompiledSerializer(
+    ('title', 'slug', 'price', 'description', 'images', 'category_id', 'review_count', 'rating_sum',
+     'image', 'image_url', 'sale_price', 'variants', 'stock', 'is_featured', 'is_new'),
+    object_id_fields=('category_id',),
+    nested_fields=('variants',),
+)
+product_list_serializer = CompiledSerializer(('title', 'slug', 'price', 'description'))
+category_serializer = CompiledSerializer(
+    ('name', 'slug', 'description', 'parent_id', 'icon'), object_id_fields=('parent_id',),
+)
+
+def cart_serializer(cart, products=None):
     context = cart
     items = [] 
     cart['subtotal'] = 0
+    if products is None:
+        products = get_products_by_slug(item['product_slug'] for item in cart['items'])
     
     for item in cart['items']:
-        product = mongodb.database['products'].find_one({"slug": item['product_slug']})
+        product = products.get(item['product_slug'])
+        if not product:
+            continue
         item_data = {
             'title': product['title'], 
             'slug': product['slug'], 
@@ -49,23 +97,24 @@ def cart_serializer(cart):
             'quantity': item['quantity'], 
             'total_amount': item['quantity'] * product['price'] 
         }
-        cart['subtotal'] = item_data['total_amount']
+        cart['subtotal'] += item_data['total_amount']
         items.append(item_data)
     
     cart['items'] = items
     cart['cart_id'] = cart['_id']
-    cart['shipping'] = 6
-    cart['tax'] = 5
-    cart['total'] = cart['subtotal'] + cart['shipping'] + cart['tax']
+    cart['shipping'] = SHIPPING_FEE
+    cart['tax'] = TAX
+    cart['total'] = order_total(cart['subtotal'])
     return context
 
 def review_serializer(reviews):
     context = []
+    reviews = list(reviews)
+    usernames = get_usernames(review['user_id'] for review in reviews)
 
     for review in reviews:
-        username = User.objects.get(id=review['user_id'])
         rev = {
-            'username': username,
+            'username': usernames.get(review['user_id'], ''),
             'rating': review['rating'],
             'comment': review['comment'],
             'date': review['date'],
@@ -75,27 +124,39 @@ def review_serializer(reviews):
     return context
 
 def product_serializer(product):
+    # honey_api.categories builds on this module's serializers, so import it lazily
+    from honey_api.categories import category_store
+
     context = mongo_serializer(product)
+    # imported products may have no category, and a category may have been deleted
+    category = (category_store.get(product['category_id']) if product.get('category_id') else None) or {}
 
-    category_id = get_object_id(product['category_id'])
-    category = mongodb.database['categories'].find_one({'_id':category_id})
-    
-    context['category_slug'] = category['slug']
-    context['category_name'] = category['name']
+    context['category_slug'] = category.get('slug')
+    context['category_name'] = category.get('name')
+    context['review_count'] = product.get('review_count', 0)
+    context['rating'] = average_rating(product)
 
     return context
 
+def average_rating(product):
+    if not product.get('review_count'):
+        return None
+    return round(product['rating_sum'] / product['review_count'], 1)
+
 def order_serializer(orders):
     orders = mongo_serializer(orders)
-    total_spend = 0
+    # orders keep a snapshot of title and price; only orders placed before that need the catalog
+    products = get_products_by_slug(
+        item['product_slug'] for order in orders for item in order['items'] if 'title' not in item
+    )
 
-    for order_index in range(len(orders)):
+    for order in orders:
         order_data = []
-           
-        total_spend += orders[order_index]['total_amount']
 
-        for item in orders[order_index]['items']:
-            product = mongodb.database['products'].find_one({'slug': item['product_slug']})
+        for item in order['items']:
+            product = item if 'title' in item else products.get(item['product_slug'])
+            if not product:
+                continue
             data = {
                 'name': product['title'],
                 'quantity': item['quantity'],
@@ -104,6 +165,6 @@ def order_serializer(orders):
             }
             order_data.append(data)
 
-        orders[order_index]['items'] = order_data
+        order['items'] = order_data
 
-    return total_spend, orders
\ No newline at end of file
+    return orders
\ No newline at end of file
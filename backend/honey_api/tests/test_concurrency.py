@@ -0,0 +1,66 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from honey_api import concurrency
+from honey_api.concurrency import fan_out
+from mongodb_monitoring import current_view
+
+
+def fail():
+    raise ValueError('boom')
+
+
+def socket_timeout():
+    raise TimeoutError('timed out')
+
+
+class FanOutTestCase(SimpleTestCase):
+    def test_calls_run_concurrently(self):
+        start = time.monotonic()
+        with fan_out() as fetch:
+            calls = [fetch.submit(time.sleep, 0.2) for _ in range(3)]
+            for call in calls:
+                call.result()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_errors_are_isolated(self):
+        with fan_out() as fetch:
+            failing = fetch.submit(fail)
+            working = fetch.submit(lambda: 42)
+            self.assertEqual(working.result(), 42)
+            self.assertEqual(failing.result(default=[]), [])
+            with self.assertRaisesMessage(ValueError, 'boom'):
+                failing.result()
+
+    def test_timeout(self):
+        with fan_out(timeout=0.05) as fetch:
+            slow = fetch.submit(time.sleep, 0.5)
+            with self.assertRaises(TimeoutError):
+                slow.result()
+
+    def test_request_context_is_copied(self):
+        token = current_view.set('/checkout/')
+        try:
+            with fan_out() as fetch:
+                view = fetch.submit(current_view.get)
+                self.assertEqual(view.result(), '/checkout/')
+        finally:
+            current_view.reset(token)
+
+    def test_saturated_pool_runs_inline(self):
+        pool, _ = concurrency._executor()
+        with mock.patch.object(concurrency, '_executor', return_value=(pool, threading.Semaphore(0))):
+            with fan_out() as fetch:
+                call = fetch.submit(threading.current_thread)
+                self.assertIs(call.result(), threading.current_thread())
+                failing = fetch.submit(socket_timeout)
+                self.assertIsNone(failing.result(default=None))
+
+    def test_timeout_raised_by_the_call_is_its_error(self):
+        with fan_out() as fetch:
+            call = fetch.submit(socket_timeout)
+            with self.assertRaisesMessage(TimeoutError, 'timed out'):
+                call.result()
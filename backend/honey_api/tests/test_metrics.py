@@ -0,0 +1,37 @@
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from mongodb_monitoring import MongoMetrics
+
+
+class SharedMetricsTestCase(SimpleTestCase):
+    def test_workers_are_summed(self):
+        with tempfile.TemporaryDirectory() as shared_dir:
+            workers = [MongoMetrics(shared_dir=shared_dir) for _ in range(3)]
+            for count, worker in enumerate(workers, start=1):
+                for _ in range(count):
+                    worker.command('products', 'find', 0.001, 'product_detail')
+                worker.flush()
+
+            body = MongoMetrics(shared_dir=shared_dir).render()
+        self.assertIn('mongodb_command_duration_seconds_count{collection="products",command="find"} 6', body)
+
+    def test_without_a_shared_dir_only_this_process_counts(self):
+        metrics = MongoMetrics()
+        metrics.command('orders', 'insert', 0.001, 'create_order')
+        self.assertIn('mongodb_command_duration_seconds_count{collection="orders",command="insert"} 1',
+                      metrics.render())
+
+
+class MetricsEndpointTestCase(SimpleTestCase):
+    def test_off_by_default(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape-me')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE mongodb_command_duration_seconds histogram')
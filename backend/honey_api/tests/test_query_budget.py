@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from honey_api.profiling import QueryBudgetExceeded, assert_query_budget, query_shape
+
+
+class QueryShapeTestCase(SimpleTestCase):
+    def test_literals_are_ignored(self):
+        first = {'find': 'products', 'filter': {'slug': 'acacia'}, 'limit': 1, 'lsid': {'id': 1}}
+        second = {'find': 'products', 'filter': {'slug': 'clover'}, 'limit': 1, 'lsid': {'id': 2}}
+        self.assertEqual(query_shape(first), query_shape(second))
+
+    def test_in_lists_share_a_shape(self):
+        self.assertEqual(query_shape({'slug': {'$in': ['a']}}), query_shape({'slug': {'$in': ['a', 'b', 'c']}}))
+
+    def test_different_filters_differ(self):
+        self.assertNotEqual(query_shape({'filter': {'slug': 'a'}}), query_shape({'filter': {'_id': 'a'}}))
+
+
+class QueryBudgetTestCase(TestCase):
+    def test_per_item_lookups_are_flagged(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            with assert_query_budget(repeats=2) as profile:
+                for slug in ('acacia', 'clover', 'thyme'):
+                    profile.record_mongo('products', 'find', {'find': 'products', 'filter': {'slug': slug}}, 0.001)
+
+    def test_sql_queries_are_counted(self):
+        with assert_query_budget(sql=1) as profile:
+            get_user_model().objects.filter(username='nobody').exists()
+        self.assertEqual(profile.sql_count, 1)
+
+    def test_sql_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with assert_query_budget(sql=1, repeats=10):
+                for _ in range(3):
+                    get_user_model().objects.filter(username='nobody').exists()
@@ -0,0 +1,119 @@
+import functools
+import itertools
+import threading
+import types
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+# from requirements-dev.txt; without it this module errors instead of being skipped
+import mongomock
+import mongomock.collection
+
+import mongodb_connector
+import mongodb_monitoring
+from core.models import Address
+from honey_api.mongo_models import carts, orders, recommendations
+from honey_api.profiling import QueryBudgetExceeded
+
+# Collection methods the views use and the command pymongo sends for each
+COMMANDS = {
+    'find': 'find', 'find_one': 'find', 'aggregate': 'aggregate', 'count_documents': 'aggregate',
+    'insert_one': 'insert', 'insert_many': 'insert', 'update_one': 'update', 'update_many': 'update',
+    'replace_one': 'update', 'bulk_write': 'update', 'delete_one': 'delete', 'delete_many': 'delete',
+    'find_one_and_update': 'findAndModify',
+}
+
+_inside = threading.local()
+
+
+def _reporting(method, command_name, listener, ids):
+    # mongomock publishes no command events; hand each call to the real listener instead
+    @functools.wraps(method)
+    def wrapper(collection, *args, **kwargs):
+        # find_one() and friends call find() internally: report only the outer call
+        if getattr(_inside, 'call', False):
+            return method(collection, *args, **kwargs)
+        request_id = next(ids)
+        command = {command_name: collection.name, 'filter': args[0] if args else kwargs.get('filter')}
+        listener.started(types.SimpleNamespace(command_name=command_name, command=command,
+                                               request_id=request_id, connection_id=None))
+        _inside.call = True
+        try:
+            result = method(collection, *args, **kwargs)
+        finally:
+            _inside.call = False
+        listener.succeeded(types.SimpleNamespace(command_name=command_name, request_id=request_id,
+                                                 connection_id=None, duration_micros=100))
+        return result
+    return wrapper
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True)
+class RequestBudgetTestCase(TestCase):
+    """Multi-item cart pages through the test client, the middleware and CommandMetricsListener."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        listener = mongodb_monitoring.CommandMetricsListener(mongodb_monitoring.metrics)
+        ids = itertools.count()
+        collection = mongomock.collection.Collection
+        builder = mongomock.collection.BulkOperationBuilder
+        add_update, add_replace = builder.add_update, builder.add_replace
+        patches = [
+            mock.patch.object(mongodb_connector, 'MongoClient', mongomock.MongoClient),
+            mock.patch.object(mongodb_connector.mongodb, '_client', None),
+            # mongomock has neither the hello command nor transactions
+            mock.patch.object(orders, '_transactions', False),
+            # nor $topN / $firstN, which the recommendation refresh after an order needs
+            mock.patch.object(recommendations, 'record_order', lambda items: None),
+            # pymongo >= 4.9 passes sort= to bulk updates and replaces, which mongomock does not know about
+            mock.patch.object(builder, 'add_update', lambda self, *a, sort=None, **kw: add_update(self, *a, **kw)),
+            mock.patch.object(builder, 'add_replace', lambda self, *a, sort=None, **kw: add_replace(self, *a, **kw)),
+        ]
+        patches += [mock.patch.object(collection, name, _reporting(getattr(collection, name), command, listener, ids))
+                    for name, command in COMMANDS.items()]
+        for patch in patches:
+            patch.start()
+            cls.addClassCleanup(patch.stop)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='budget', password='budget-password')
+        self.address = Address.objects.create(user=self.user, name='Home', address='1 Hive Street',
+                                              city='Bee Town', state='Nectar', postal_code='12345')
+        database = mongodb_connector.mongodb.database
+        category_id = database['categories'].insert_one(
+            {'name': 'Raw', 'slug': 'raw', 'description': '', 'parent_id': None}).inserted_id
+        for i in range(5):
+            slug = f'honey-{i}'
+            database['products'].insert_one({'title': slug, 'title_lower': slug, 'slug': slug, 'status': 'active',
+                                             'category_id': category_id, 'price': 10.0 + i,
+                                             'description': '', 'images': []})
+            carts.add_item(self.user.id, slug, 2, 10.0 + i)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        mongodb_connector.mongodb.client.drop_database(mongodb_connector.mongodb.db_name)
+
+    def assertCommandsCounted(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('desc="0 commands"', response['Server-Timing'])
+
+    def test_cart_view(self):
+        self.assertCommandsCounted(self.client.get('/cart/'))
+
+    def test_checkout(self):
+        self.assertCommandsCounted(self.client.get('/checkout/'))
+
+    def test_create_order(self):
+        response = self.client.post('/order/create/', {'saved_address': self.address.id,
+                                                       'idempotency_key': uuid.uuid4().hex})
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(orders.collection.count_documents({'user_id': self.user.id}), 1)
+
+    @override_settings(QUERY_BUDGET_MONGO=1)
+    def test_budget_is_enforced(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/checkout/')
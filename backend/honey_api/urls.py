@@ -3,21 +3,28 @@ from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as catalog_views
+else:
+    catalog_views = views
+
 urlpatterns = [
 
-    path('', views.index, name='index'),
+    path('', catalog_views.index, name='index'),
     path('shop/', views.shop, name='shop'),
+    path('search/suggest/', catalog_views.search_suggestions, name='search_suggestions'),
 
     path('categories/', views.category_list, name='category_list'),
     # path('category/create/', views.create_category, name='create_category'),
 
     path('contact/', views.contact, name='contact'),
 
-    path('products/', views.product_list, name='product_list'),
+    path('products/', catalog_views.product_list, name='product_list'),
     path('product/add_review/', views.add_review, name='add_review'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('product/<slug:slug>/', catalog_views.product_detail, name='product_detail'),
+    path('product/<slug:slug>/reviews/', catalog_views.product_reviews, name='product_reviews'),
 
-    path('cart/', views.cart_view, name='cart'),
+    path('cart/', catalog_views.cart_view, name='cart'),
     path('cart/add/', views.add_to_cart, name='add_to_cart'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
     path('cart/remove/<str:slug>/', views.remove_from_cart, name='remove_from_cart'),
@@ -25,4 +32,6 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('orders/', views.get_orders, name='orders'),
     path('order/create/', views.create_order, name='create_order'),
+
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,7 +1,10 @@
 from mongodb_connector import mongodb
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from django.utils.text import slugify
+import re
 import uuid
 
 def get_object_id(id_string):
@@ -10,25 +13,129 @@ def get_object_id(id_string):
     except:
         return None
 
+def _slug_counter_key(collection, base_slug):
+    return f"{collection}:{base_slug}"
+
+def _highest_slug_suffix(collection, base_slug):
+    """-1 when the base slug is free, 0 when only the base is taken, else the largest N of base-N."""
+    pattern = re.compile('^%s(-[0-9]+)?$' % re.escape(base_slug))
+    highest = -1
+    for doc in mongodb.database[collection].find({'slug': pattern}, {'slug': 1, '_id': 0}):
+        suffix = doc['slug'][len(base_slug):]
+        highest = max(highest, int(suffix[1:]) if suffix else 0)
+    return highest
+
 def generate_unique_slug(collection, title):
+    """
+    Next free slug for a title: base, base-1, base-2... Every base slug has a
+    counter document in slug_counters that is $inc'ed, so a collision costs one
+    round trip and concurrent callers never get the same suffix. The counter is
+    seeded once from the slugs that already exist. Callers still insert against
+    the unique slug index, which catches the rare cross-base clash (a title
+    that slugifies to "honey-1" while "honey" is at 1) - see create_with_slug.
+    """
     base_slug = slugify(title)
-    slug = base_slug
-    counter = 1
-    
-    while mongodb.database[collection].find_one({"slug": slug}):
-        slug = f"{base_slug}-{counter}"
-        counter += 1
-    
-    return slug
+    counters = mongodb.database['slug_counters']
+    key = _slug_counter_key(collection, base_slug)
+
+    counter = counters.find_one_and_update({'_id': key}, {'$inc': {'seq': 1}},
+                                           return_document=ReturnDocument.AFTER)
+    if counter is None:
+        seq = _highest_slug_suffix(collection, base_slug) + 1
+        try:
+            counters.insert_one({'_id': key, 'seq': seq})
+        except DuplicateKeyError:
+            # another process seeded it first
+            counter = counters.find_one_and_update({'_id': key}, {'$inc': {'seq': 1}},
+                                                   return_document=ReturnDocument.AFTER)
+            seq = counter['seq']
+    else:
+        seq = counter['seq']
+
+    return base_slug if seq == 0 else f"{base_slug}-{seq}"
+
+class SlugAllocator:
+    """
+    Unique slugs for many titles at once, in the same base, base-1, base-2...
+    scheme as generate_unique_slug but with one query per batch instead of
+    one per candidate. Slugs handed out are remembered, so titles that repeat
+    within one import still get distinct slugs.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.taken = set()
+        self.next_suffix = {}
+
+    def _load(self, bases):
+        bases = [base for base in set(bases) if base not in self.next_suffix]
+        if not bases:
+            return
+
+        for base in bases:
+            self.next_suffix[base] = 1
+        # base-N can exist while base itself does not (e.g. "honey" was renamed), so the
+        # numbered slugs of every new base are scanned; anchored prefix regexes, each one
+        # is an index range scan on slug
+        patterns = [re.compile('^%s-[0-9]+$' % re.escape(base)) for base in bases]
+        collection = mongodb.database[self.collection]
+        for doc in collection.find({'slug': {'$in': bases + patterns}}, {'slug': 1}):
+            self.taken.add(doc['slug'])
+            base, _, suffix = doc['slug'].rpartition('-')
+            if base in self.next_suffix and suffix.isdigit():
+                self.next_suffix[base] = max(self.next_suffix[base], int(suffix) + 1)
+
+    def allocate(self, titles):
+        bases = [slugify(title) for title in titles]
+        self._load(bases)
+
+        slugs = []
+        for base in bases:
+            slug = base
+            while slug in self.taken:
+                slug = f"{base}-{self.next_suffix[base]}"
+                self.next_suffix[base] += 1
+            self.taken.add(slug)
+            slugs.append(slug)
+
+        if not bases:
+            return slugs
+
+        # keep the slug_counters of generate_unique_slug ahead of what was handed out here
+        mongodb.database['slug_counters'].bulk_write([
+            UpdateOne({'_id': _slug_counter_key(self.collection, base)},
+                      {'$max': {'seq': self.next_suffix[base] - 1}}, upsert=True)
+            for base in set(bases)
+        ], ordered=False)
+        return slugs
+
+SHIPPING_FEE = 6
+TAX = 5
+
+def order_total(subtotal):
+    return round(subtotal + SHIPPING_FEE + TAX, 2)
 
 def generate_order_number():
     return f"ORD-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
 
-def cart_total_amount(cart):
-    total_amount = 0
-    for item in cart['items']:
-        product_slug = item['product_slug']
-        product_price = mongodb.database['products'].find_one({"slug":product_slug})['price']
-        total_amount += item['quantity'] * product_price
+def get_products_by_slug(slugs, fields=('title', 'slug', 'price'), primary=False):
+    slugs = list(set(slugs))
+    if not slugs:
+        return {}
+
+    projection = {field: 1 for field in fields}
+    projection['slug'] = 1
+    # primary=True when the result is charged for, a lagging secondary could return an old price
+    database = mongodb.database if primary else mongodb.catalog_database
+    products = database['products'].find({"slug": {"$in": slugs}}, projection)
+    return {product['slug']: product for product in products}
+
+async def aget_products_by_slug(slugs, fields=('title', 'slug', 'price')):
+    slugs = list(set(slugs))
+    if not slugs:
+        return {}
 
-    return total_amount
\ No newline at end of file
+    projection = {field: 1 for field in fields}
+    projection['slug'] = 1
+    products = await mongodb.async_catalog_database['products'].find({"slug": {"$in": slugs}}, projection).to_list()
+    return {product['slug']: product for product in products}
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.conf import settings
+
+from mongodb_connector import mongodb
+
+# Catalog version counters live in the `versions` collection
+# ({_id: name, version: n, modified_at: last bump}). Every worker keeps a snapshot
+# of all counters and re-reads it at most once per CATALOG_VERSION_CHECK_INTERVAL
+# seconds, so readers normally cost no I/O.
+_snapshot = {}
+_checked_at = None
+_lock = threading.Lock()
+
+
+def bump(name):
+    global _checked_at
+    mongodb.database['versions'].update_one(
+        {'_id': name}, {'$inc': {'version': 1}, '$currentDate': {'modified_at': True}}, upsert=True)
+    with _lock:
+        _checked_at = None
+
+
+def _fresh(now):
+    return _checked_at is not None and now - _checked_at < settings.CATALOG_VERSION_CHECK_INTERVAL
+
+
+def _store(documents, now):
+    global _snapshot, _checked_at
+    snapshot = {doc['_id']: doc for doc in documents}
+    with _lock:
+        _snapshot = snapshot
+        _checked_at = now
+    return snapshot
+
+
+def snapshot():
+    """{name: {'version': n, 'modified_at': datetime}} for every counter."""
+    now = time.monotonic()
+    with _lock:
+        if _fresh(now):
+            return _snapshot
+    return _store(mongodb.database['versions'].find(), now)
+
+
+async def asnapshot():
+    now = time.monotonic()
+    with _lock:
+        if _fresh(now):
+            return _snapshot
+    return _store(await mongodb.async_database['versions'].find().to_list(), now)
+
+
+def current(name):
+    return snapshot().get(name, {}).get('version', 0)
+
+
+async def acurrent(name):
+    return (await asnapshot()).get(name, {}).get('version', 0)
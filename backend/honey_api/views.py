@@ -2,27 +2,52 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse, Http404
+from django.conf import settings
 from core.models import Address
 from datetime import datetime
+import hmac
+import uuid
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from honey_api.serializer import mongo_serializer, cart_serializer, review_serializer, product_serializer, order_serializer
+from honey_api.serializer import (
+    cart_serializer, review_serializer, product_serializer, order_serializer,
+    product_card_serializer, product_list_serializer,
+)
 from mongodb_connector import mongodb
-from honey_api.utils import get_object_id, cart_total_amount
-
-from honey_api.mongo_models import CartManager, ReviewManager, OrderManager
+from mongodb_monitoring import metrics as mongo_metrics
+from honey_api.utils import get_products_by_slug
+
+from honey_api.mongo_models import ReviewManager, carts, orders, recommendations
+from honey_api.pagination import MongoQuery, keyset_page
+from honey_api.search import text_search, suggest_products
+from honey_api.categories import category_store
+from honey_api.cache import cached
+from honey_api.concurrency import fan_out
+from honey_api.http_cache import catalog_page
 from core.serializers import AddressSerializer
 
+SHOP_PAGE_SIZE = 4
+SHOP_SORT_FIELDS = ('title', 'price')
+REVIEWS_PAGE_SIZE = 10
+ORDERS_PAGE_SIZE = 10
+
 
 @require_http_methods(["GET"])
+@catalog_page('products', 'categories')
 def index(request):
     try:
-        products = mongodb.database['products'].find().limit(3)
-        categories = mongodb.database['categories'].find()
+        featured_products = cached(
+            'featured_products', (),
+            lambda: product_card_serializer.many(
+                mongodb.catalog_database['products'].find({}, product_card_serializer.projection).limit(3)
+            ),
+            tags=('products',),
+        )
 
         context = {
-            'featured_products': mongo_serializer(products),
-            'categories': mongo_serializer(categories)
+            'featured_products': featured_products,
+            'categories': category_store.serialized()
         }
         return render(request, 'index.html', context)
 
@@ -31,12 +56,11 @@ def index(request):
 
 
 @require_http_methods(["GET"])
+@catalog_page('categories')
 def category_list(request):
     try:
-        categories = mongodb.database['categories'].find()
-
         context = {
-            'categories': mongo_serializer(categories)
+            'categories': category_store.serialized()
         }
 
         return render(request, 'index.html', context)
@@ -45,12 +69,19 @@ def category_list(request):
 
 
 @require_http_methods(["GET"])
+@catalog_page('products')
 def product_list(request):
     try:
-        products = mongodb.database['products'].find()
+        products = cached(
+            'product_list', (),
+            lambda: product_list_serializer.many(
+                mongodb.catalog_database['products'].find({}, product_list_serializer.projection)
+            ),
+            tags=('products',),
+        )
 
         context = {
-            'products': mongo_serializer(products),
+            'products': products,
         }
 
         return render(request, 'products.html', context)
@@ -60,20 +91,30 @@ def product_list(request):
 
 
 @require_http_methods(["GET"])
+@catalog_page('products', 'categories', 'reviews')
 def product_detail(request, slug):
     try:
-        product = mongodb.database['products'].find_one({"slug": slug})
-        reviews = mongodb.database['reviews'].find({"product_slug": slug})
-        related_products = mongodb.database['products'].find({
-            "category_id": product['category_id'],
-            "_id": {"$ne": product['_id']} 
-        })
-
-        context = {
-            'product': product_serializer(product),
-            'reviews': review_serializer(reviews),
-            'related_products': mongo_serializer(related_products)
-        }
+        def load():
+            with fan_out() as fetch:
+                # the reviews only need the slug, fetch them while the product loads
+                reviews_page = fetch.submit(product_reviews_page, slug)
+                product = mongodb.catalog_database['products'].find_one({"slug": slug})
+                if not product:
+                    return None
+                related = fetch.submit(recommendations.related, product)
+                serialized_product = product_serializer(product)
+                reviews, reviews_next = reviews_page.result()
+
+                return {
+                    'product': serialized_product,
+                    'reviews': review_serializer(reviews),
+                    'reviews_next': reviews_next,
+                    'related_products': related.result(default=[])
+                }
+
+        context = cached('product_detail', (slug,), load, tags=('products', 'categories', 'reviews'))
+        if context is None:
+            return render(request, '404.html', {'detail': "Product not found."}, status=404)
 
         return render(request, 'product_detail.html', context)
         
@@ -81,7 +122,22 @@ def product_detail(request, slug):
         return render(request, '404.html', {'detail': str(e)}, status=404)
 
 
+def product_reviews_page(slug, after=None):
+    return keyset_page(mongodb.catalog_database['reviews'], {"product_slug": slug}, 'date',
+                       direction=-1, after=after, limit=REVIEWS_PAGE_SIZE)
+
+
 @require_http_methods(["GET"])
+def product_reviews(request, slug):
+    try:
+        reviews, next_cursor = product_reviews_page(slug, request.GET.get('after'))
+        return JsonResponse({'results': review_serializer(reviews), 'next': next_cursor})
+    except Exception as e:
+        return JsonResponse({'detail': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@catalog_page('products', 'categories')
 def shop(request):
     try:
         search_query = request.GET.get('q')
@@ -90,14 +146,19 @@ def shop(request):
         page_number = request.GET.get('page', 1)
         
         filters = {}
+        search_sort = None
+        projection = dict(product_card_serializer.projection)
         
         if search_query:
-            filters['title'] = {'$regex': search_query, '$options': 'i'} 
+            search_filters, search_sort, search_projection = text_search(search_query)
+            filters.update(search_filters)
+            projection.update(search_projection)
         
         if category_slug:
-            category_obj = mongodb.database['categories'].find_one({'slug': category_slug})
+            category_obj = category_store.get_by_slug(category_slug)
             if category_obj:
-                filters['category_id'] = category_obj['_id']
+                category_ids = category_store.descendant_ids(category_obj['_id'])
+                filters['category_id'] = category_ids[0] if len(category_ids) == 1 else {'$in': category_ids}
         
         sort_field = 'title' 
         sort_direction = 1
@@ -108,15 +169,25 @@ def shop(request):
             else:
                 sort_field = sort_by
 
-        products = mongodb.database['products'].find(filters, sort=[(sort_field, sort_direction)])
-        categories = mongodb.database['categories'].find()
+        if sort_field not in SHOP_SORT_FIELDS:
+            sort_field, sort_direction = 'title', 1
+
+        sort = [(sort_field, sort_direction)]
+        if search_sort and 'sort' not in request.GET:
+            sort = search_sort
 
-        paginator = Paginator(list(mongo_serializer(products)), 4)
+        # free-text searches would add a cache entry per distinct query string; only the
+        # category/sort listings, whose key space is bounded, are cached
+        products = MongoQuery(mongodb.catalog_database['products'], filters, sort=sort, projection=projection,
+                              serializer=product_card_serializer.many,
+                              cache_namespace=None if search_query else 'shop',
+                              cache_tags=('products', 'categories'))
+        paginator = Paginator(products, SHOP_PAGE_SIZE)
         products_page = paginator.get_page(page_number)
         
         context = {
             'products': products_page,
-            'categories': mongo_serializer(categories),
+            'categories': category_store.serialized(),
             'search_query': search_query,
             'selected_category_slug': category_slug,
             'sort_by': sort_by,
@@ -128,6 +199,12 @@ def shop(request):
         return render(request, '404.html', {'detail': str(e)}, status=404)
 
 
+@require_http_methods(["GET"])
+def search_suggestions(request):
+    suggestions = suggest_products(request.GET.get('q', ''))
+    return JsonResponse({'results': suggestions})
+
+
 @require_http_methods(["POST"])
 def contact(request):
     try:
@@ -149,12 +226,7 @@ def contact(request):
 @require_http_methods(["GET"])
 def cart_view(request):
     try:
-        user_cart = mongodb.database['carts'].find_one({"user_id": request.user.id})
-
-        if not user_cart:
-            user_cart = CartManager()
-            user_cart.create_cart(request.user.id)        
-            user_cart = mongodb.database['carts'].find_one({"user_id": request.user.id})
+        user_cart = carts.get_or_create(request.user.id)
 
         context = {
             'cart': cart_serializer(user_cart)
@@ -171,36 +243,16 @@ def cart_view(request):
 @login_required(login_url='login')
 def add_to_cart(request):
     try:
-        user_cart = mongodb.database['carts'].find_one({"user_id": request.user.id})
-
-        if not user_cart:
-            user_cart = CartManager()
-            user_cart.create_cart(request.user.id)        
-            user_cart = mongodb.database['carts'].find_one({"user_id": request.user.id})
-
         data = request.POST
         product_slug = data.get('product_slug')
         quantity = int(data.get('quantity'))
 
-        item_exists = False
-        for item in user_cart['items']:
-            if item['product_slug'] == product_slug: 
-                item['quantity'] += quantity
-                item_exists = True
-        
-        if not item_exists:
-            new_item = {
-                'product_slug': product_slug,
-                'quantity': quantity,
-            }
-            user_cart['items'].append(new_item)
-        
-        total_amount = cart_total_amount(user_cart)
-        
-        mongodb.database['carts'].update_one(
-            {"user_id": int(request.user.id)},
-            {"$set": {"items": user_cart['items'], "total_amount": total_amount}}
-        )
+        product = get_products_by_slug([product_slug], fields=('price',)).get(product_slug)
+        if not product or quantity < 1:
+            messages.error(request, "This product can't be added to your cart.")
+            return redirect(request.META.get('HTTP_REFERER', '/'))
+
+        carts.add_item(request.user.id, product_slug, quantity, product['price'])
 
         messages.success(request, "Item successfully added to your cart.")
         return redirect(request.META.get('HTTP_REFERER', '/')) 
@@ -214,17 +266,7 @@ def add_to_cart(request):
 @login_required(login_url='login')
 def remove_from_cart(request, slug):
     try:
-        user_cart = mongodb.database['carts'].find_one({'user_id': request.user.id})
-        items = []
-
-        for item in user_cart['items']:
-            if item['product_slug'] != slug:
-                items.append(item)
-
-        mongodb.database['carts'].update_one(
-            {'user_id': request.user.id},
-            {"$set": {"items": items}} 
-        )
+        carts.remove_item(request.user.id, slug)
 
         messages.success(request, "Item successfully removed from your cart.")
         return redirect(request.META.get('HTTP_REFERER', '/')) 
@@ -238,18 +280,11 @@ def remove_from_cart(request, slug):
 @login_required(login_url='login')
 def clear_cart(request):
     try:
-        user_cart = mongodb.database['carts'].find_one({'user_id': request.user.id})
-
-        if len(user_cart['items']):
+        if carts.clear(request.user.id):
             messages.success(request, "Your cart has been successfully cleared.")
         else:
             messages.success(request, "Your cart is already empty.")
 
-        mongodb.database['carts'].update_one(
-            {'user_id': request.user.id},
-            {"$set": {"items": []}} 
-        )
-
         return redirect(request.META.get('HTTP_REFERER', '/')) 
     except Exception as e:
         messages.error(request, str(e))
@@ -284,17 +319,16 @@ def add_review(request):
 @login_required(login_url='login')
 def checkout(request):
     try:
-        user_id = request.user.id
-        orders = mongodb.database['orders'].find({'user_id': user_id})
-        cart = mongodb.database['carts'].find_one({'user_id': user_id})
-
-        addresses = Address.objects.filter(user=request.user)
-        addresses_list = AddressSerializer(addresses, many=True).data
-        cart_data = cart_serializer(cart)
+        with fan_out() as fetch:
+            cart = fetch.submit(carts.get_or_create, request.user.id)
+            addresses = Address.objects.filter(user=request.user)
+            addresses_list = AddressSerializer(addresses, many=True).data
+            cart_data = cart_serializer(cart.result())
 
         context = {
             'saved_addresses': addresses_list,
             'cart': cart_data,
+            'idempotency_key': uuid.uuid4().hex,
         }
 
         return render(request, 'checkout.html', context)
@@ -303,16 +337,19 @@ def checkout(request):
         return render(request, '404.html', {'detail': str(e)}, status=500)
 
 
+def user_orders_page(user_id, after=None):
+    return keyset_page(mongodb.database['orders'], {'user_id': user_id}, 'date', direction=-1,
+                       after=after, limit=ORDERS_PAGE_SIZE)
+
+
 @require_http_methods(["GET"])
 @login_required(login_url='login')
 def get_orders(request):
     try:
-        user_id = request.user.id
-        orders = mongodb.database['orders'].find({'user_id': user_id})
-        return order_serializer(orders)
+        user_orders, next_cursor = user_orders_page(request.user.id, request.GET.get('after'))
+        return JsonResponse({'results': order_serializer(user_orders), 'next': next_cursor})
     except Exception as e:
-        messages.error(request, str(e))
-        return {}
+        return JsonResponse({'detail': str(e)}, status=500)
 
 
 @csrf_exempt
@@ -321,20 +358,33 @@ def get_orders(request):
 def create_order(request):
     try:
         data = request.POST
-        cart_id = get_object_id(data['cart_id'])
+        address_id = data.get('saved_address')
+        if not address_id or not Address.objects.filter(user=request.user, id=address_id).exists():
+            messages.error(request, "Please choose a shipping address.")
+            return redirect('checkout')
 
-        user_id = request.user.id   
-        items = mongodb.database['carts'].find_one({'_id': cart_id})['items']
-        total_amount = data['total_amount']
-        address_id = data['saved_address']
+        # the key is rendered into the checkout form, so a resubmitted form finds its first order
+        idempotency_key = data.get('idempotency_key') or uuid.uuid4().hex
+        order, created = orders.place_order(request.user.id, int(address_id), idempotency_key)
 
-        order = OrderManager()
-        order.create_order(user_id, items, total_amount, address_id)
-
-        mongodb.database['carts'].delete_one({"_id": cart_id}) 
-
-        messages.success(request, "Your order has been placed successfully!")
+        if created:
+            messages.success(request, "Your order has been placed successfully!")
+        else:
+            messages.success(request, f"Order #{order['order_number']} was already placed.")
+        return redirect('cart')
+    except ValueError as e:
+        messages.error(request, str(e))
         return redirect('cart')
     except Exception as e:
         messages.error(request, str(e))
-        return render(request, '404.html', {'detail': str(e)}, status=500)
\ No newline at end of file
+        return render(request, '404.html', {'detail': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def metrics(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    # the site is public through the load balancer: with a token set only the scraper gets in
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        raise Http404
+    return HttpResponse(mongo_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -24,14 +24,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'honey_api.middleware.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'honey_api.middleware.SharedCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'honey_api.middleware.MongoMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'honey_site.urls'
@@ -47,6 +51,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'honey_api.context_processors.fragment_cache',
             ],
         },
     },
@@ -68,13 +73,92 @@ MONGODB_SETTINGS = {
     'db': 'honey_site'
 }
 
+# `manage.py check --deploy` warns when declared MongoDB indexes are missing
+MONGO_INDEX_CHECK = config('MONGO_INDEX_CHECK', default=True, cast=bool)
+
+# Prometheus text exposition of MongoDB driver metrics at /metrics/, off by default since the
+# site is public; METRICS_TOKEN makes it answer only "Authorization: Bearer <token>".
+# Each gunicorn worker counts for itself: set METRICS_DIR (docker/entrypoint.sh does) so
+# every scrape reports all workers instead of whichever one the request lands on.
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Serve the catalog and cart pages from honey_api.async_views (async MongoDB client).
+# Only worth it under ASGI (honey_site.asgi); docker/entrypoint.sh switches server with it.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# honey_api.concurrency: threads shared by all requests of a worker for fanning out
+# independent reads, and how long one request waits for them (seconds)
+FAN_OUT_WORKERS = config('FAN_OUT_WORKERS', default=8, cast=int)
+FAN_OUT_TIMEOUT = config('FAN_OUT_TIMEOUT', default=5.0, cast=float)
+
+# Per-request query budget (honey_api.middleware.QueryBudgetMiddleware). Requests over
+# budget or repeating one query shape more than QUERY_BUDGET_REPEATS times are logged;
+# with QUERY_BUDGET_STRICT (set it in CI) they raise instead. It profiles every command
+# and reports the counts in a Server-Timing header, so it is only on in development and CI.
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=DEBUG or QUERY_BUDGET_STRICT, cast=bool)
+QUERY_BUDGET_MONGO = config('QUERY_BUDGET_MONGO', default=20, cast=int)
+QUERY_BUDGET_SQL = config('QUERY_BUDGET_SQL', default=10, cast=int)
+QUERY_BUDGET_REPEATS = config('QUERY_BUDGET_REPEATS', default=3, cast=int)
+
+# Caches: per-worker memory by default, a shared Redis when REDIS_URL is set
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': config('LOCMEM_CACHE_MAX_ENTRIES', default=5000, cast=int)},
+        }
+    }
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+CATALOG_CACHE_LOCK_TIMEOUT = 5
+
+# How often (seconds) each worker re-reads the catalog version counters
+CATALOG_VERSION_CHECK_INTERVAL = config('CATALOG_VERSION_CHECK_INTERVAL', default=5, cast=float)
+
+# honey_api.http_cache: how long proxies and browsers may reuse an anonymous catalog page
+# before revalidating it, and a per-deploy id (e.g. the git sha) so new templates and static
+# files change the ETags and the {% cache %} fragment keys (honey_api.context_processors)
+PAGE_CACHE_MAX_AGE = config('PAGE_CACHE_MAX_AGE', default=60, cast=int)
+RELEASE_ID = config('RELEASE_ID', default='')
+
 CORS_ALLOW_CREDENTIALS = True
 
+# Process-level user_id -> username cache used when rendering reviews
+USERNAME_CACHE_SIZE = config('USERNAME_CACHE_SIZE', default=10000, cast=int)
+USERNAME_CACHE_TTL = config('USERNAME_CACHE_TTL', default=300, cast=int)
+
 # Static files
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# WhiteNoise serves STATIC_ROOT from the workers. With the manifest storage collectstatic
+# writes content-hashed copies plus .gz/.br variants, and hashed files are sent with
+# far-future immutable Cache-Control. It needs collectstatic to have run, so only
+# docker/Dockerfile.prod (which runs it at build time) turns it on with STATIC_MANIFEST=1.
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=not DEBUG, cast=bool)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+                    else 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
 
 # Media files
 MEDIA_URL = '/media/'
@@ -1,9 +1,22 @@
 # backend/mongodb_connector.py  (سازگار با کد فعلی پروژه)
+import asyncio
 import os
+import threading
 import time
 from urllib.parse import urlparse
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.errors import ServerSelectionTimeoutError, AutoReconnect
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+import mongodb_monitoring
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
 
 def _extract_db_name(uri: str, fallback: str = "honey") -> str:
     try:
@@ -17,34 +30,112 @@ def _extract_db_name(uri: str, fallback: str = "honey") -> str:
         pass
     return fallback
 
+def _env_int(name: str):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else None
+
+def _client_options(connect_timeout: float) -> dict:
+    options = {
+        "serverSelectionTimeoutMS": int(connect_timeout * 1000),
+        "connectTimeoutMS": int(connect_timeout * 1000),
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE"),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE"),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS"),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS"),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    }
+    compressors = os.getenv("MONGO_COMPRESSORS", "").strip()
+    if compressors:
+        options["compressors"] = compressors
+    # گزینه‌های تنظیم‌نشده به پیش‌فرض‌های خود pymongo (یا مقدار داخل URI) سپرده می‌شوند
+    return {key: value for key, value in options.items() if value is not None}
+
 class MongoDBConnection:
     """
     کانکشن سازگار با کد پروژه:
       - ویژگی های public:
-          .client   -> MongoClient
-          .database -> Database
+          .client           -> MongoClient
+          .database         -> Database (خواندن/نوشتن روی primary؛ برای cart و order)
+          .catalog_database -> Database با read preference کاتالوگ (محصول، دسته، نظر)
+          .async_database / .async_catalog_database -> همان‌ها با AsyncMongoClient برای view های async
+      - کلاینت lazy ساخته می‌شود: import هیچ‌وقت منتظر MongoDB نمی‌ماند و
+        بعد از fork (مثلاً worker های gunicorn) هر پروسه کلاینت خودش را می‌سازد.
       - از ENV ها استفاده می‌کند:
           MONGO_URI (پیش‌فرض: mongodb://mongo:27017/honey)
           MONGO_DB_NAME (اختیاری؛ اگر در URI نباشد)
           MONGO_CONNECT_TIMEOUT (اختیاری، ثانیه؛ پیش‌فرض 5)
+          MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+          MONGO_SOCKET_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS (اختیاری)
+          MONGO_COMPRESSORS (اختیاری؛ مثال: zstd,snappy,zlib)
+          MONGO_CATALOG_READ_PREFERENCE (اختیاری؛ پیش‌فرض primary، مثال: secondaryPreferred)
+          MONGO_SLOW_COMMAND_MS (اختیاری؛ آستانه‌ی لاگ دستورات کند، پیش‌فرض 100)
+      - listener های mongodb_monitoring روی کلاینت ثبت می‌شوند (endpoint: /metrics/)
     """
     def __init__(self):
         self.uri = os.getenv("MONGO_URI", "mongodb://mongo:27017/honey")
         self.connect_timeout = float(os.getenv("MONGO_CONNECT_TIMEOUT", "5"))
         self.db_name = os.getenv("MONGO_DB_NAME", _extract_db_name(self.uri, "honey"))
+        self.options = _client_options(self.connect_timeout)
+
+        read_preference = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "primary")
+        if read_preference not in READ_PREFERENCES:
+            raise ValueError(f"[mongodb_connector] Unknown MONGO_CATALOG_READ_PREFERENCE: {read_preference}")
+        self.catalog_read_preference = READ_PREFERENCES[read_preference]()
+
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._async_client = None
+        self._async_loop = None
+
+    @property
+    def client(self):
+        # MongoClient بعد از fork قابل استفاده نیست؛ با عوض شدن pid کلاینت تازه می‌سازیم
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    if self._client is not None:
+                        # آمار pool پروسه‌ی والد برای این پروسه معتبر نیست
+                        mongodb_monitoring.metrics.reset()
+                    self._client = MongoClient(self.uri, connect=False,
+                                               event_listeners=mongodb_monitoring.listeners(),
+                                               **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def database(self):
+        return self.client[self.db_name]
+
+    @property
+    def catalog_database(self):
+        return self.client.get_database(self.db_name, read_preference=self.catalog_read_preference)
+
+    @property
+    def async_client(self):
+        # AsyncMongoClient به event loop ای که اول در آن استفاده شده وابسته است؛
+        # زیر ASGI هر worker یک loop دارد، پس عملاً یک کلاینت برای هر worker ساخته می‌شود
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = AsyncMongoClient(self.uri, event_listeners=mongodb_monitoring.listeners(),
+                                                  **self.options)
+            self._async_loop = loop
+        return self._async_client
+
+    @property
+    def async_database(self):
+        return self.async_client[self.db_name]
 
-        self.client = None
-        self.database = None
-        self._connect_with_retry()
+    @property
+    def async_catalog_database(self):
+        return self.async_client.get_database(self.db_name, read_preference=self.catalog_read_preference)
 
-    def _connect_with_retry(self, retries: int = 12, delay: float = 2.5):
+    def wait_until_ready(self, retries: int = 12, delay: float = 2.5):
         last_err = None
         for _ in range(retries):
             try:
-                self.client = MongoClient(self.uri, serverSelectionTimeoutMS=int(self.connect_timeout * 1000))
                 # تست اتصال
-                self.client.server_info()
-                self.database = self.client[self.db_name]
+                self.client.admin.command("ping")
                 return
             except (ServerSelectionTimeoutError, AutoReconnect) as e:
                 last_err = e
@@ -53,9 +144,7 @@ class MongoDBConnection:
         raise RuntimeError(f"[mongodb_connector] MongoDB connection failed after retries. Last error: {last_err}")
 
     def get_collection(self, name: str):
-        if self.database is None:
-            self._connect_with_retry()
         return self.database[name]
 
 # singleton سازگار با import موجود در پروژه
-mongodb = MongoDBConnection()
\ No newline at end of file
+mongodb = MongoDBConnection()
@@ -0,0 +1,339 @@
+# backend/mongodb_monitoring.py
+# listener های monitoring برای pymongo: زمان دستورات، انتظار pool، اتصال‌های در حال استفاده
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from pymongo import monitoring
+
+logger = logging.getLogger("mongodb.slow")
+
+# نام view جاری جنگو؛ توسط honey_api.middleware.MongoMetricsMiddleware مقداردهی می‌شود
+current_view = contextvars.ContextVar("mongodb_current_view", default="-")
+# پروفایل کوئری‌های درخواست جاری (honey_api.profiling)؛ هر دستور در آن هم ثبت می‌شود
+current_profile = contextvars.ContextVar("mongodb_current_profile", default=None)
+
+# ثانیه
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# دستوراتی که ارزش شمردن ندارند (handshake، heartbeat و احراز هویت)
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+                    "authenticate", "getnonce", "endSessions", "buildinfo", "buildInfo"}
+
+# جدول‌های MongoMetrics بر اساس نوع؛ gauge ها فقط برای worker های زنده جمع زده می‌شوند
+HISTOGRAMS = ("commands", "pool_wait", "heartbeats")
+COUNTERS = ("command_failures", "checkout_failures", "heartbeat_failures")
+GAUGES = ("checked_out", "connections_open")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, counts, total, count):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.total += total
+        self.count += count
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            yield bound, running
+
+
+def _labels(**labels):
+    body = ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for key, value in labels.items())
+    return "{%s}" % body if body else ""
+
+
+def _address(address):
+    return "%s:%s" % address if isinstance(address, tuple) else str(address)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MongoMetrics:
+    """
+    داده‌های جمع‌شده از listener ها در یک پروسه.
+    gunicorn چند worker دارد و هر scrape فقط به یکی از آن‌ها می‌رسد؛ با shared_dir
+    (env: METRICS_DIR) هر worker هر flush_interval ثانیه یک snapshot در آن پوشه می‌نویسد
+    و render() همه‌ی worker ها را با هم جمع می‌زند. بدون آن، خروجی فقط مال همین پروسه است.
+    """
+    def __init__(self, slow_command_ms=100, slow_log_size=50, shared_dir=None, flush_interval=5.0):
+        self.slow_command_ms = slow_command_ms
+        self.shared_dir = shared_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._snapshot_path = None
+        self._snapshot_pid = None
+        self._flushed_at = 0.0
+        self.reset()
+        self.slow_commands = deque(maxlen=slow_log_size)
+
+    def reset(self):
+        with self._lock:
+            self.commands = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.command_failures = defaultdict(int)
+            self.pool_wait = defaultdict(lambda: Histogram(POOL_WAIT_BUCKETS))
+            self.checkout_failures = defaultdict(int)
+            self.checked_out = defaultdict(int)
+            self.connections_open = defaultdict(int)
+            self.heartbeats = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.heartbeat_failures = defaultdict(int)
+
+    def command(self, collection, command_name, seconds, view, failed=False):
+        with self._lock:
+            self.commands[(collection, command_name)].observe(seconds)
+            if failed:
+                self.command_failures[(collection, command_name)] += 1
+        if seconds * 1000 >= self.slow_command_ms:
+            entry = {"collection": collection, "command": command_name, "view": view,
+                     "duration_ms": round(seconds * 1000, 2), "at": time.time()}
+            self.slow_commands.append(entry)
+            logger.warning("slow mongo command %s.%s took %.1fms in view %s",
+                           collection, command_name, seconds * 1000, view)
+        self.maybe_flush()
+
+    def state(self):
+        def key(k):
+            return list(k) if isinstance(k, tuple) else [k]
+
+        with self._lock:
+            state = {name: [[key(k), h.counts, h.total, h.count] for k, h in getattr(self, name).items()]
+                     for name in HISTOGRAMS}
+            state.update({name: [[key(k), v] for k, v in getattr(self, name).items()]
+                          for name in COUNTERS + GAUGES})
+        return state
+
+    def merge(self, state, gauges=True):
+        def key(k):
+            return tuple(k) if len(k) > 1 else k[0]
+
+        with self._lock:
+            for name in HISTOGRAMS:
+                table = getattr(self, name)
+                for k, counts, total, count in state.get(name, ()):
+                    table[key(k)].merge(counts, total, count)
+            for name in COUNTERS + (GAUGES if gauges else ()):
+                table = getattr(self, name)
+                for k, value in state.get(name, ()):
+                    table[key(k)] += value
+
+    def flush(self):
+        """snapshot این پروسه را در shared_dir می‌نویسد (اسم فایل: pid-زمان شروع)."""
+        if not self.shared_dir:
+            return
+        # بعد از fork (یا اگر pid دوباره استفاده شود) فایل تازه؛ snapshot پروسه‌ی قبلی دست نمی‌خورد
+        if self._snapshot_pid != os.getpid():
+            self._snapshot_pid = os.getpid()
+            self._snapshot_path = os.path.join(self.shared_dir, f"{self._snapshot_pid}-{time.time_ns()}.json")
+        self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(self.shared_dir, exist_ok=True)
+            temporary = self._snapshot_path + ".tmp"
+            with open(temporary, "w") as f:
+                json.dump(self.state(), f)
+            os.replace(temporary, self._snapshot_path)
+        except OSError as e:
+            logger.warning("could not write mongo metrics snapshot to %s: %s", self.shared_dir, e)
+
+    def maybe_flush(self):
+        if self.shared_dir and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def collect(self):
+        """همه‌ی snapshot های shared_dir با هم؛ شمارنده‌های worker های مرده می‌مانند تا counter ها عقب نروند."""
+        if not self.shared_dir:
+            return self
+        self.flush()
+        total = MongoMetrics(self.slow_command_ms)
+        try:
+            names = os.listdir(self.shared_dir)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.shared_dir, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            total.merge(state, gauges=_alive(int(name.split("-")[0])))
+        return total
+
+    def render(self):
+        return self.collect()._render()
+
+    def _render(self):
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                for bound, count in hist.cumulative():
+                    lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+                lines.append(f"{name}_sum{_labels(**labels)} {hist.total:.6f}")
+                lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+        def simple(name, kind, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                lines.append(f"{name}{_labels(**labels)} {value}")
+
+        with self._lock:
+            histogram("mongodb_command_duration_seconds", "MongoDB command latency as seen by the driver.",
+                      [({"collection": c, "command": n}, h) for (c, n), h in sorted(self.commands.items())])
+            simple("mongodb_command_failures_total", "counter", "MongoDB commands that returned an error.",
+                   [({"collection": c, "command": n}, v) for (c, n), v in sorted(self.command_failures.items())])
+            histogram("mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+                      [({"address": a}, h) for a, h in sorted(self.pool_wait.items())])
+            simple("mongodb_pool_checkout_failures_total", "counter", "Failed connection checkouts.",
+                   [({"address": a, "reason": r}, v) for (a, r), v in sorted(self.checkout_failures.items())])
+            simple("mongodb_pool_connections_in_use", "gauge", "Connections currently checked out of the pool.",
+                   [({"address": a}, v) for a, v in sorted(self.checked_out.items())])
+            simple("mongodb_pool_connections_open", "gauge", "Connections currently open in the pool.",
+                   [({"address": a}, v) for a, v in sorted(self.connections_open.items())])
+            histogram("mongodb_server_heartbeat_seconds", "Server monitoring round-trip time.",
+                      [({"address": a}, h) for a, h in sorted(self.heartbeats.items())])
+            simple("mongodb_server_heartbeat_failures_total", "counter", "Failed server heartbeats.",
+                   [({"address": a}, v) for a, v in sorted(self.heartbeat_failures.items())])
+        return "\n".join(lines) + "\n"
+
+
+def _collection_name(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        profile = current_profile.get()
+        self._started[(event.request_id, event.connection_id)] = (
+            _collection_name(event.command_name, event.command), current_view.get(),
+            profile, event.command if profile is not None else None)
+
+    def _finish(self, event, failed):
+        started = self._started.pop((event.request_id, event.connection_id), None)
+        if started is None:
+            return
+        collection, view, profile, command = started
+        seconds = event.duration_micros / 1e6
+        self.metrics.command(collection, event.command_name, seconds, view, failed)
+        if profile is not None:
+            profile.record_mongo(collection, event.command_name, command, seconds)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def _update(self, table, key, delta):
+        with self.metrics._lock:
+            table[key] += delta
+
+    def connection_checked_out(self, event):
+        address = _address(event.address)
+        with self.metrics._lock:
+            self.metrics.pool_wait[address].observe(event.duration)
+            self.metrics.checked_out[address] += 1
+
+    def connection_check_out_failed(self, event):
+        self._update(self.metrics.checkout_failures, (_address(event.address), event.reason), 1)
+
+    def connection_checked_in(self, event):
+        self._update(self.metrics.checked_out, _address(event.address), -1)
+
+    def connection_created(self, event):
+        self._update(self.metrics.connections_open, _address(event.address), 1)
+
+    def connection_closed(self, event):
+        self._update(self.metrics.connections_open, _address(event.address), -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+class HeartbeatMetricsListener(monitoring.ServerHeartbeatListener):
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self.metrics._lock:
+            self.metrics.heartbeats[_address(event.connection_id)].observe(event.duration)
+        # heartbeat ها در worker بی‌کار هم می‌آیند؛ snapshot آن هم تازه می‌ماند
+        self.metrics.maybe_flush()
+
+    def failed(self, event):
+        with self.metrics._lock:
+            self.metrics.heartbeat_failures[_address(event.connection_id)] += 1
+        self.metrics.maybe_flush()
+
+
+metrics = MongoMetrics(slow_command_ms=float(os.getenv("MONGO_SLOW_COMMAND_MS", "100")),
+                       shared_dir=os.getenv("METRICS_DIR") or None,
+                       flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "5")))
+
+
+def listeners():
+    return [CommandMetricsListener(metrics), PoolMetricsListener(metrics), HeartbeatMetricsListener(metrics)]
@@ -5,6 +5,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "honey_site.settings")
 django.setup()
 
 from honey_api.mongo_models import CategoryManager, ProductManager, ReviewManager, CartManager, OrderManager
+from honey_api.utils import SlugAllocator
 from datetime import datetime
 
 # Constants
@@ -24,6 +25,8 @@ products.collection.delete_many({})
 reviews.collection.delete_many({})
 carts.collection.delete_many({})
 orders.collection.delete_many({})
+reviews.collection.database['user_stats'].delete_many({})
+reviews.collection.database['slug_counters'].delete_many({})
 
 now = datetime.now()
 
@@ -35,12 +38,11 @@ categories_list = [
     {"name": "Honey Comb"},
 ]
 
-category_ids = {}
-for cat in categories_list:
-    categories.create_category(cat["name"])  # create category
-    # fetch the category from DB by name to get its ID
-    cat_doc = categories.collection.find_one({"name": cat["name"]})
-    category_ids[cat["name"]] = str(cat_doc["_id"])
+category_slugs = SlugAllocator(categories.collection_name).allocate([cat["name"] for cat in categories_list])
+category_docs = [categories.build_category(cat["name"], slug) for cat, slug in zip(categories_list, category_slugs)]
+# insert_many returns the new ids in order, no need to read the categories back
+inserted_ids = categories.create_many(category_docs)
+category_ids = {cat["name"]: category_id for cat, category_id in zip(categories_list, inserted_ids)}
 
 
 # --- Products ---
@@ -57,9 +59,11 @@ product_list = [
     {"title": "Mini Honey Comb", "category": "Honey Comb", "price": 9.99, "description": "Small portion of honey comb for tasting"},
 ]
 
-for p in product_list:
-    cat_id = category_ids[p["category"]]
-    products.create_product(p["title"], cat_id, p["price"], p["description"])
+product_slugs = SlugAllocator(products.collection_name).allocate([p["title"] for p in product_list])
+products.create_many([
+    products.build_product(p["title"], slug, category_ids[p["category"]], p["price"], p["description"])
+    for p, slug in zip(product_list, product_slugs)
+])
 
 # --- Reviews ---
 reviews_data = [
@@ -2,5 +2,13 @@
 set -e
 cd /app/backend
 python manage.py migrate --noinput || true
-python manage.py collectstatic --noinput || true
+python manage.py mongo_indexes || true
+# review counters only move with $inc; seed the ones that predate them
+python manage.py rebuild_review_stats --missing || true
+# every gunicorn worker keeps its own MongoDB metrics; /metrics/ merges the snapshots kept here
+export METRICS_DIR="${METRICS_DIR:-/tmp/honey-metrics}"
+rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
+if [ "${ASYNC_VIEWS:-0}" = "1" ]; then
+  exec gunicorn honey_site.asgi:application -k uvicorn_worker.UvicornWorker --chdir /app/backend --bind 0.0.0.0:${PORT:-8000} --workers 3 --timeout 60
+fi
 exec gunicorn honey_site.wsgi:application --chdir /app/backend --bind 0.0.0.0:${PORT:-8000} --workers 3 --threads 2 --timeout 60